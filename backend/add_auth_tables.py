@@ -44,8 +44,8 @@ def run_migration():
     -- Create indexes for performance
     CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
     CREATE INDEX IF NOT EXISTS idx_magic_tokens_user_id ON magic_tokens(user_id);
-    CREATE INDEX IF NOT EXISTS idx_magic_tokens_token ON magic_tokens(token);
     CREATE INDEX IF NOT EXISTS idx_magic_tokens_expires_at ON magic_tokens(expires_at);
+    CREATE INDEX IF NOT EXISTS ix_magic_tokens_active ON magic_tokens(expires_at) WHERE used_at IS NULL;
     CREATE INDEX IF NOT EXISTS idx_magic_tokens_used_at ON magic_tokens(used_at);
     
     -- Update trigger for users.updated_at
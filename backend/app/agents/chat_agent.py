@@ -5,6 +5,7 @@ from pydantic_ai import Agent, RunContext
 from pydantic_ai.models.openai import OpenAIModel
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
+import heapq
 import os
 import re
 from sqlalchemy.orm import Session
@@ -13,7 +14,8 @@ from sqlalchemy import text, func
 from backend.app.db.database import get_db
 from backend.app.schemas.schemas import ChatResponse
 from backend.app.services.privacy_filter import PrivacyFilter
-from backend.app.models.models import Relatorio, RelatorioTermo, TermoTecnico
+from backend.app.services.term_catalog import get_term_catalog
+from backend.app.models.models import Relatorio, RelatorioTermo, TipoTermoEnum
 
 
 class QueryIntent(BaseModel):
@@ -144,11 +146,12 @@ def load_technology_keywords(db: Session) -> dict:
     """
     global _tech_keywords_cache
     with _tech_keywords_lock:
-        if _tech_keywords_cache is not None:
-            return _tech_keywords_cache
+        catalog = get_term_catalog(db)
+        # Rebuilt only when the shared catalog has been reloaded
+        if _tech_keywords_cache is not None and _tech_keywords_cache[0] is catalog:
+            return _tech_keywords_cache[1]
         mapping = {}
-        termos = db.query(TermoTecnico).all()
-        for termo in termos:
+        for termo in catalog:
             # Main term
             mapping[termo.termo.lower().strip()] = termo.termo_normalizado
             # Normalized term
@@ -163,7 +166,7 @@ def load_technology_keywords(db: Session) -> dict:
                     # Sometimes stored as comma-separated string
                     for syn in termo.sinonimos.split(","):
                         mapping[syn.lower().strip()] = termo.termo_normalizado
-        _tech_keywords_cache = mapping
+        _tech_keywords_cache = (catalog, mapping)
         return mapping
 
 def get_technology_keywords(db: Session) -> dict:
@@ -171,6 +174,104 @@ def get_technology_keywords(db: Session) -> dict:
     return load_technology_keywords(db)
 
 
+_tech_key_patterns_cache = None
+
+def get_technology_key_patterns(technology_keywords: dict) -> List[tuple]:
+    """
+    Keyword mapping keys sorted longest first (to avoid substring matches),
+    each paired with a precompiled word-boundary pattern for 1-2 character
+    keys or None for plain substring matching. Cached per mapping.
+    """
+    global _tech_key_patterns_cache
+    with _tech_keywords_lock:
+        if _tech_key_patterns_cache is not None and _tech_key_patterns_cache[0] is technology_keywords:
+            return _tech_key_patterns_cache[1]
+        key_patterns = [
+            (tech_key, re.compile(r'\b' + re.escape(tech_key) + r'\b') if len(tech_key) <= 2 else None)
+            for tech_key in sorted(technology_keywords.keys(), key=len, reverse=True)
+        ]
+        _tech_key_patterns_cache = (technology_keywords, key_patterns)
+        return key_patterns
+
+
+# Query parsing patterns used by the keyword-based intent analysis
+# "na/no [Company Name]" - captures full names with accents
+COMPANY_MENTION_PATTERN = re.compile(
+    r'\b(?:na|no|em)\s+([A-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]+(?:[A-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]*)*)', re.IGNORECASE | re.UNICODE
+)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+CAPITALIZED_WORD_PATTERN = re.compile(r'\b[A-Z][a-zA-Z]+\b')
+YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+
+
+# Short terms that are prone to false positives in free text
+PROBLEMATIC_TERMS = {'r', 'go', 'ai', 'ml', 'js', 'ts', 'c#'}
+
+# Words suggesting the surrounding text is about technology
+TECH_CONTEXT_WORDS = [
+    'desenvolvimento', 'programação', 'linguagem', 'tecnologia',
+    'framework', 'biblioteca', 'ferramenta', 'plataforma',
+    'banco', 'dados', 'sistema', 'aplicação', 'projeto'
+]
+
+# Activity type detection keywords, compiled once into substring alternations
+ACTIVITY_TYPE_KEYWORDS = {
+    'Desenvolvimento': ['desenvolvimento', 'development', 'programação', 'coding', 'implementação', 'criação'],
+    'Manutenção': ['manutenção', 'maintenance', 'correção', 'bug', 'fix', 'atualização'],
+    'Testes': ['teste', 'test', 'testing', 'qa', 'qualidade', 'validação'],
+    'Análise': ['análise', 'analysis', 'analisar', 'estudo', 'pesquisa', 'investigação'],
+    'Documentação': ['documentação', 'documentation', 'docs', 'manual', 'especificação'],
+    'Suporte': ['suporte', 'support', 'ajuda', 'assistência', 'técnico'],
+    'Integração': ['integração', 'integration', 'api', 'serviço', 'conexão'],
+    'Otimização': ['otimização', 'optimization', 'performance', 'melhoria', 'refatoração']
+}
+ACTIVITY_TYPE_PATTERNS = {
+    activity_type: re.compile('|'.join(map(re.escape, keywords)))
+    for activity_type, keywords in ACTIVITY_TYPE_KEYWORDS.items()
+}
+
+_tech_matchers_cache = None
+_tech_matchers_lock = threading.Lock()
+
+def load_technology_matchers(db: Session) -> List[Dict[str, Any]]:
+    """
+    Builds from the shared terms catalog a precompiled word-boundary
+    pattern per term (plus the context pattern required for single letters).
+    Returns one entry per distinct lowercased term, in catalog order.
+    """
+    global _tech_matchers_cache
+    with _tech_matchers_lock:
+        catalog = get_term_catalog(db)
+        if _tech_matchers_cache is not None and _tech_matchers_cache[0] is catalog:
+            return _tech_matchers_cache[1]
+        matchers = []
+        seen = set()
+        for tech in catalog:
+            tech_name_lower = tech.termo.lower().strip()
+            if tech_name_lower in seen:
+                continue
+            seen.add(tech_name_lower)
+            escaped = re.escape(tech_name_lower)
+            context_pattern = None
+            if tech_name_lower in PROBLEMATIC_TERMS and len(tech_name_lower) == 1:
+                # For single letters, only count clear programming language references
+                context_pattern = re.compile(
+                    r'\b(?:linguagem|programação\s+em|desenvolvimento\s+em|código|script)\s+' + escaped + r'\b',
+                    re.IGNORECASE
+                )
+            matchers.append({
+                'technology': tech.termo,
+                'category': tech.tipo.value if hasattr(tech.tipo, 'value') else str(tech.tipo),
+                'normalized': tech.termo_normalizado,
+                'pattern': re.compile(r'\b' + escaped + r'\b', re.IGNORECASE),
+                'context_pattern': context_pattern,
+                # 2-letter terms outside PROBLEMATIC_TERMS need a tech context
+                'needs_tech_context': tech_name_lower not in PROBLEMATIC_TERMS and len(tech_name_lower) <= 2,
+            })
+        _tech_matchers_cache = (catalog, matchers)
+        return matchers
+
+
 async def get_top_technologies(db: Session, tipo: str, year: Optional[int] = None, limit: int = 10, order_by_usage: str = "desc") -> DBQueryResult:
     """Get top technologies by type and optionally filtered by year"""
     # Map user-friendly types to database enum values
@@ -309,38 +410,44 @@ async def search_reports_by_technology(db: Session, technology: str, year: Optio
     return DBQueryResult(data=data, total_count=len(data))
 
 
-async def get_activities_by_company(
-    db: Session,
-    company_name: str,
-    year: Optional[int] = None,
-    limit: int = 50
-) -> DBQueryResult:
-    """Busca atividades realizadas em uma empresa específica usando embeddings"""
-    # Normalize company name for matching
-    company_patterns = {
-        'btg': ['%btg pactual%', '%btg%'],
-        'cip': ['%cip%', '%centro de informação%'],
-        'virtual': ['%virtual cirurgia%', '%virtual%']
-    }
+# Known company name variations, matched with ILIKE
+COMPANY_PATTERNS = {
+    'btg': ['%btg pactual%', '%btg%'],
+    'cip': ['%cip%', '%centro de informação%'],
+    'virtual': ['%virtual cirurgia%', '%virtual%']
+}
 
-    company_conditions = []
-    for key, patterns in company_patterns.items():
-        if key.lower() in company_name.lower():
-            company_conditions.extend(patterns)
+def build_company_where(company_name: str, params: Dict[str, Any]) -> str:
+    """
+    Builds the OR-ed ILIKE condition on r.empresa_razao_social for a company
+    name, adding the patterns to params as bind parameters.
+    """
+    for key, patterns in COMPANY_PATTERNS.items():
+        if key in company_name.lower():
+            company_conditions = patterns
             break
     else:
         # If no specific pattern, use the company name directly
         company_conditions = [f'%{company_name}%']
 
-    # Build WHERE clause for company matching
     company_where_parts = []
-    for pattern in company_conditions:
-        company_where_parts.append(f"r.empresa_razao_social ILIKE '{pattern}'")
+    for i, pattern in enumerate(company_conditions):
+        params[f'company_{i}'] = pattern
+        company_where_parts.append(f"r.empresa_razao_social ILIKE :company_{i}")
 
-    company_where = " OR ".join(company_where_parts)
+    return " OR ".join(company_where_parts)
 
+
+async def get_activities_by_company(
+    db: Session,
+    company_name: str,
+    year: Optional[int] = None,
+    limit: int = 50
+) -> DBQueryResult:
+    """Busca atividades realizadas em uma empresa específica usando embeddings"""
     filters = []
     params = {}
+    company_where = build_company_where(company_name, params)
 
     if year:
         filters.append("r.ano = :year")
@@ -355,7 +462,7 @@ async def get_activities_by_company(
         FROM relatorio_embeddings re
         JOIN relatorios r ON re.relatorio_id = r.id
         WHERE re.secao = 'atividades_realizadas'{where_clause}
-        ORDER BY r.ano DESC, r.periodo DESC
+        ORDER BY r.ano DESC, r.periodo DESC, re.id
         LIMIT :limit
     """
 
@@ -491,13 +598,10 @@ async def analyze_query_intent_fallback(message: str, db: Session) -> AdvancedQu
     technology_keywords = get_technology_keywords(db)
     # Look for technology mentions in the query - prioritize longer, more specific terms
     # Sort technology keys by length (longest first) to avoid substring matches
-    sorted_tech_keys = sorted(technology_keywords.keys(), key=len, reverse=True)
-
-    for tech_key in sorted_tech_keys:
+    for tech_key, pattern in get_technology_key_patterns(technology_keywords):
         # For very short terms (1-2 characters), use word boundaries to avoid false positives
-        if len(tech_key) <= 2:
-            pattern = r'\b' + re.escape(tech_key) + r'\b'
-            if re.search(pattern, message_lower):
+        if pattern is not None:
+            if pattern.search(message_lower):
                 specific_technology = technology_keywords[tech_key]
                 break
         else:
@@ -521,11 +625,11 @@ async def analyze_query_intent_fallback(message: str, db: Session) -> AdvancedQu
         # Look for patterns like "na TEB", "no Itaú", "na empresa X"
 
         # Pattern 1: "na/no [Company Name]" - improved to capture full names with accents
-        company_match = re.search(r'\b(?:na|no|em)\s+([A-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]+(?:[A-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]*)*)', message, re.IGNORECASE | re.UNICODE)
+        company_match = COMPANY_MENTION_PATTERN.search(message)
         if company_match:
             company_name = company_match.group(1).strip()
             # Clean up the company name - remove extra spaces
-            company_name = re.sub(r'\s+', ' ', company_name)
+            company_name = WHITESPACE_PATTERN.sub(' ', company_name)
             # Avoid common words that might be mistaken for companies
             common_words = ['empresa', 'empresas', 'sistema', 'projeto', 'trabalho', 'estagio', 'estágio', 'atividades', 'linguagem', 'framework', 'sao']
             # Also avoid technology names that might be mistaken for companies
@@ -538,7 +642,7 @@ async def analyze_query_intent_fallback(message: str, db: Session) -> AdvancedQu
         # Pattern 2: Look for company names in the sentence (but avoid technology names)
         if not company_filter:
             # Find sequences of capitalized words
-            words = re.findall(r'\b[A-Z][a-zA-Z]+\b', message)
+            words = CAPITALIZED_WORD_PATTERN.findall(message)
             for i, word in enumerate(words):
                 # Skip common words
                 if word.lower() in ['qual', 'quais', 'como', 'onde', 'quando', 'por', 'que', 'na', 'no', 'em', 'do', 'da', 'dos', 'das', 'um', 'uma', 'uns', 'umas', 'sao', 'atividade', 'atividades']:
@@ -553,7 +657,7 @@ async def analyze_query_intent_fallback(message: str, db: Session) -> AdvancedQu
 
     # Extract year filter
     year_filter = None
-    year_match = re.search(r'\b(20\d{2})\b', message_lower)
+    year_match = YEAR_PATTERN.search(message_lower)
     if year_match:
         year_filter = int(year_match.group(1))
 
@@ -600,87 +704,136 @@ async def get_total_reports_count(db: Session, year: Optional[int] = None) -> in
     return count
 
 
-async def get_technologies_from_activities_content(db: Session, activities_content: List[str], company_name: Optional[str] = None) -> List[Dict[str, Any]]:
-    """Busca tecnologias reais do banco de dados baseadas no conteúdo das atividades com busca aprimorada"""
+async def get_activity_technologies_by_company(
+    db: Session,
+    company_name: str,
+    year: Optional[int] = None,
+    activities_limit: int = 50,
+    limit: int = 15
+) -> List[Dict[str, Any]]:
+    """
+    Agrega no banco as tecnologias extraídas das atividades dos relatórios de uma empresa.
+    Considera os mesmos relatórios retornados por get_activities_by_company (mesmo
+    filtro de ano, ordenação e limite). Termos problemáticos de uma letra ficam de
+    fora, pois exigem a verificação de contexto feita sobre o texto das atividades.
+    """
     try:
-        # Get all technologies from the database
-        technologies_query = db.query(TermoTecnico).all()
+        params = {
+            'limit': limit,
+            'activities_limit': activities_limit,
+            'context_terms': [term for term in PROBLEMATIC_TERMS if len(term) == 1]
+        }
+        company_where = build_company_where(company_name, params)
+
+        year_where = ""
+        if year:
+            year_where = " AND r.ano = :year"
+            params['year'] = year
+
+        sql = f"""
+            WITH atividades AS (
+                SELECT re.relatorio_id
+                FROM relatorio_embeddings re
+                JOIN relatorios r ON re.relatorio_id = r.id
+                WHERE re.secao = 'atividades_realizadas' AND ({company_where}){year_where}
+                ORDER BY r.ano DESC, r.periodo DESC, re.id
+                LIMIT :activities_limit
+            )
+            SELECT tt.termo, tt.tipo, tt.termo_normalizado, SUM(rt.frequencia) as count
+            FROM relatorio_termos rt
+            JOIN termos_tecnicos tt ON tt.id = rt.termo_id
+            WHERE rt.secao = 'atividades_realizadas'
+              AND rt.relatorio_id IN (SELECT DISTINCT relatorio_id FROM atividades)
+              AND LOWER(TRIM(tt.termo)) <> ALL(:context_terms)
+            GROUP BY tt.id, tt.termo, tt.tipo, tt.termo_normalizado
+            HAVING LENGTH(TRIM(tt.termo)) > 2 OR SUM(rt.frequencia) >= 2
+            ORDER BY count DESC
+            LIMIT :limit
+        """
+
+        rows = db.execute(text(sql), params).fetchall()
 
-        # Create a mapping of technology names to their data
-        tech_mapping = {}
-        for tech in technologies_query:
-            termo_lower = tech.termo.lower().strip()
-            if termo_lower not in tech_mapping:
-                tech_mapping[termo_lower] = tech
+        return [{
+            'technology': row[0],
+            'category': TipoTermoEnum[row[1]].value if row[1] in TipoTermoEnum.__members__ else str(row[1]),
+            'count': int(row[3]),
+            'normalized': row[2]
+        } for row in rows]
+
+    except Exception as e:
+        print(f"Error aggregating company technologies: {e}")
+        return []
+
+
+def count_context_technologies(db: Session, all_content: str) -> List[Dict[str, Any]]:
+    """Conta termos de uma letra (ex.: R) apenas quando citados em contexto de programação"""
+    techs = []
+    for matcher in load_technology_matchers(db):
+        if matcher['context_pattern'] is None:
+            continue
+        if not matcher['context_pattern'].search(all_content):
+            continue
+        count = len(matcher['pattern'].findall(all_content))
+        # Very short terms require higher confidence
+        if count >= 2:
+            techs.append({
+                'technology': matcher['technology'],
+                'category': matcher['category'],
+                'count': count,
+                'normalized': matcher['normalized']
+            })
+    return techs
+
+
+async def get_technologies_from_activities_content(
+    db: Session,
+    activities_content: List[str],
+    company_name: Optional[str] = None,
+    year: Optional[int] = None,
+    activities_limit: int = 50
+) -> List[Dict[str, Any]]:
+    """Busca tecnologias reais do banco de dados baseadas no conteúdo das atividades com busca aprimorada"""
+    if company_name:
+        # Terms are already extracted into relatorio_termos; aggregate there over
+        # the same reports the activities were fetched from
+        techs = await get_activity_technologies_by_company(db, company_name, year, activities_limit)
+        try:
+            techs.extend(count_context_technologies(db, " ".join(activities_content).lower()))
+        except Exception as e:
+            print(f"Error getting technologies from database: {e}")
+        return heapq.nlargest(15, techs, key=lambda x: x['count'])
+
+    try:
+        # Precompiled matchers for the whole term catalog (loaded once)
+        matchers = load_technology_matchers(db)
 
         # Count occurrences in the activities content using word boundaries
         tech_counts = {}
         all_content = " ".join(activities_content).lower()
+        has_tech_context = any(context in all_content for context in TECH_CONTEXT_WORDS)
+
+        for matcher in matchers:
+            count = len(matcher['pattern'].findall(all_content))
 
-        # Special handling for single-character terms that are prone to false positives
-        problematic_terms = {'r', 'go', 'ai', 'ml', 'js', 'ts', 'c#'}
-
-        for tech_name, tech_obj in tech_mapping.items():
-            tech_name_lower = tech_name.lower().strip()
-
-            # Skip problematic single-letter terms unless they appear as standalone words
-            if tech_name_lower in problematic_terms and len(tech_name_lower) <= 2:
-                # For these terms, require word boundaries and check context
-                pattern = r'\b' + re.escape(tech_name_lower) + r'\b'
-                matches = re.findall(pattern, all_content, re.IGNORECASE)
-                count = len(matches)
-
-                # Additional validation for very short terms
-                if count > 0 and len(tech_name_lower) == 1:
-                    # For single letters, be very strict - only count if it's clearly a programming language reference
-                    context_patterns = [
-                        r'\blinguagem\s+' + re.escape(tech_name_lower) + r'\b',
-                        r'\bprogramação\s+em\s+' + re.escape(tech_name_lower) + r'\b',
-                        r'\bdesenvolvimento\s+em\s+' + re.escape(tech_name_lower) + r'\b',
-                        r'\bcódigo\s+' + re.escape(tech_name_lower) + r'\b',
-                        r'\bscript\s+' + re.escape(tech_name_lower) + r'\b'
-                    ]
-                    valid_context = any(re.search(pattern, all_content, re.IGNORECASE) for pattern in context_patterns)
-                    if not valid_context:
+            if count > 0:
+                if matcher['context_pattern'] is not None:
+                    # Single letters: require an explicit programming context
+                    if not matcher['context_pattern'].search(all_content):
                         count = 0
-            else:
-                # For longer terms, use word boundaries to avoid substring matches
-                if len(tech_name_lower) > 2:
-                    pattern = r'\b' + re.escape(tech_name_lower) + r'\b'
-                    matches = re.findall(pattern, all_content, re.IGNORECASE)
-                    count = len(matches)
-                else:
-                    # For 2-3 letter terms, be more careful
-                    pattern = r'\b' + re.escape(tech_name_lower) + r'\b'
-                    matches = re.findall(pattern, all_content, re.IGNORECASE)
-                    count = len(matches)
-
-                    # Additional check: ensure it's not part of a larger word
-                    if count > 0:
-                        # Check if this term appears in contexts that suggest it's a technology
-                        tech_contexts = [
-                            'desenvolvimento', 'programação', 'linguagem', 'tecnologia',
-                            'framework', 'biblioteca', 'ferramenta', 'plataforma',
-                            'banco', 'dados', 'sistema', 'aplicação', 'projeto'
-                        ]
-                        has_tech_context = any(context in all_content for context in tech_contexts)
-                        if not has_tech_context:
-                            count = max(0, count - 2)  # Reduce count if no tech context
+                elif matcher['needs_tech_context'] and not has_tech_context:
+                    count = max(0, count - 2)  # Reduce count if no tech context
 
             if count > 0:
-                tech_counts[tech_obj.termo] = {
-                    'technology': tech_obj.termo,
-                    'category': tech_obj.tipo.value if hasattr(tech_obj.tipo, 'value') else str(tech_obj.tipo),
+                tech_counts[matcher['technology']] = {
+                    'technology': matcher['technology'],
+                    'category': matcher['category'],
                     'count': count,
-                    'normalized': tech_obj.termo_normalizado
+                    'normalized': matcher['normalized']
                 }
 
-        # Sort by count and return top technologies
-        sorted_techs = sorted(tech_counts.values(), key=lambda x: x['count'], reverse=True)
-
         # Filter out technologies with very low counts that might be false positives
         filtered_techs = []
-        for tech in sorted_techs:
+        for tech in tech_counts.values():
             # For very short terms, require higher confidence
             if len(tech['technology'].strip()) <= 2 and tech['count'] < 2:
                 continue
@@ -689,7 +842,8 @@ async def get_technologies_from_activities_content(db: Session, activities_conte
                 continue
             filtered_techs.append(tech)
 
-        return filtered_techs[:15]  # Limit to top 15 to avoid noise
+        # Top 15 by count to avoid noise (heap selection, no full sort)
+        return heapq.nlargest(15, filtered_techs, key=lambda x: x['count'])
 
     except Exception as e:
         print(f"Error getting technologies from database: {e}")
@@ -710,14 +864,22 @@ async def perform_llm_analysis(prompt: str) -> str:
         return "Análise não disponível no momento."
 
 
-async def analyze_activities_patterns(db: Session, activities_content: List[str], company_name: Optional[str] = None) -> Dict[str, Any]:
+async def analyze_activities_patterns(
+    db: Session,
+    activities_content: List[str],
+    company_name: Optional[str] = None,
+    year: Optional[int] = None,
+    activities_limit: int = 50
+) -> Dict[str, Any]:
     """Analisa padrões nas atividades usando dados do banco e LLM"""
     if not activities_content:
         return {"error": "No activities content to analyze"}
 
     try:
         # Primeiro, buscar tecnologias reais do banco de dados
-        technologies_data = await get_technologies_from_activities_content(db, activities_content, company_name)
+        technologies_data = await get_technologies_from_activities_content(
+            db, activities_content, company_name, year, activities_limit
+        )
 
         # Aggregate content (limit to avoid token limits)
         aggregated_content = "\n\n".join(activities_content[:15])  # Limit to 15 activities
@@ -754,20 +916,8 @@ async def analyze_activities_patterns(db: Session, activities_content: List[str]
         all_content = " ".join(activities_content).lower()
         activities_types = []
 
-        # More comprehensive activity type detection
-        activity_patterns = {
-            'Desenvolvimento': ['desenvolvimento', 'development', 'programação', 'coding', 'implementação', 'criação'],
-            'Manutenção': ['manutenção', 'maintenance', 'correção', 'bug', 'fix', 'atualização'],
-            'Testes': ['teste', 'test', 'testing', 'qa', 'qualidade', 'validação'],
-            'Análise': ['análise', 'analysis', 'analisar', 'estudo', 'pesquisa', 'investigação'],
-            'Documentação': ['documentação', 'documentation', 'docs', 'manual', 'especificação'],
-            'Suporte': ['suporte', 'support', 'ajuda', 'assistência', 'técnico'],
-            'Integração': ['integração', 'integration', 'api', 'serviço', 'conexão'],
-            'Otimização': ['otimização', 'optimization', 'performance', 'melhoria', 'refatoração']
-        }
-
-        for activity_type, keywords in activity_patterns.items():
-            if any(keyword in all_content for keyword in keywords):
+        for activity_type, pattern in ACTIVITY_TYPE_PATTERNS.items():
+            if pattern.search(all_content):
                 activities_types.append(activity_type)
 
         # Get top technologies
@@ -884,31 +1034,9 @@ async def get_all_technologies_by_company(
     order_by_usage: str = "desc"
 ) -> DBQueryResult:
     """Get all technologies used at a specific company (not filtered by type)"""
-    # Normalize company name for matching
-    company_patterns = {
-        'btg': ['%btg pactual%', '%btg%'],
-        'cip': ['%cip%', '%centro de informação%'],
-        'virtual': ['%virtual cirurgia%', '%virtual%']
-    }
-
-    company_conditions = []
-    for key, patterns in company_patterns.items():
-        if key.lower() in company_name.lower():
-            company_conditions.extend(patterns)
-            break
-    else:
-        # If no specific pattern, use the company name directly
-        company_conditions = [f'%{company_name}%']
-
-    # Build WHERE clause for company matching
-    company_where_parts = []
-    for pattern in company_conditions:
-        company_where_parts.append(f"r.empresa_razao_social ILIKE '{pattern}'")
-
-    company_where = " OR ".join(company_where_parts)
-
     filters = []
     params = {}
+    company_where = build_company_where(company_name, params)
 
     if year:
         filters.append("r.ano = :year")
@@ -974,31 +1102,9 @@ async def get_technologies_by_company_and_type(
 
     db_tipo = type_mapping.get(technology_type.lower() if technology_type else '', technology_type.upper() if technology_type else 'LINGUAGEM')
 
-    # Normalize company name for matching
-    company_patterns = {
-        'btg': ['%btg pactual%', '%btg%'],
-        'cip': ['%cip%', '%centro de informação%'],
-        'virtual': ['%virtual cirurgia%', '%virtual%']
-    }
-
-    company_conditions = []
-    for key, patterns in company_patterns.items():
-        if key.lower() in company_name.lower():
-            company_conditions.extend(patterns)
-            break
-    else:
-        # If no specific pattern, use the company name directly
-        company_conditions = [f'%{company_name}%']
-
-    # Build WHERE clause for company matching
-    company_where_parts = []
-    for pattern in company_conditions:
-        company_where_parts.append(f"r.empresa_razao_social ILIKE '{pattern}'")
-
-    company_where = " OR ".join(company_where_parts)
-
     filters = []
     params = {}
+    company_where = build_company_where(company_name, params)
 
     if year:
         filters.append("r.ano = :year")
@@ -1209,7 +1315,9 @@ async def process_chat_message(message: str, db: Session) -> ChatResponse:
                 )
 
             # Analyze patterns (basic for now)
-            analysis = await analyze_activities_patterns(db, activities_content, intent.company_filter)
+            analysis = await analyze_activities_patterns(
+                db, activities_content, intent.company_filter, intent.year_filter, intent.limit
+            )
 
             # Handle company display
             if intent.company_filter:
@@ -21,7 +21,7 @@ from backend.app.core.auth import (
 )
 from backend.app.core.dependencies import get_current_user, get_client_ip, get_user_agent
 from backend.app.core.config import settings
-from backend.app.services.email_service import email_service
+from backend.app.services.email_service import get_email_service
 from backend.app.schemas.schemas import (
     MagicLinkRequest, 
     MagicLinkResponse, 
@@ -78,7 +78,7 @@ async def request_magic_link(
     )
     
     # Send magic link email
-    email_sent = await email_service.send_magic_link(
+    email_sent = await get_email_service().send_magic_link(
         to_email=email,
         magic_token=plain_token,
         full_name=user.full_name
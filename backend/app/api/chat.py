@@ -39,7 +39,9 @@ async def chat(
         # Add session ID if user is authenticated (could be used for chat history)
         if current_user:
             # In the future, we could create/manage chat sessions here
-            response.session_id = f"user_{current_user.id}_session"
+            response = response.model_copy(
+                update={"session_id": f"user_{current_user.id}_session"}
+            )
         
         return response
         
@@ -11,6 +11,7 @@ from backend.app.db.database import get_db
 from backend.app.schemas.schemas import ReportSearchRequest, SearchResponse, ReportSummary
 from backend.app.services.privacy_filter import PrivacyFilter
 from backend.app.services.vector_search import VectorSearchService
+from backend.app.services.term_catalog import get_term_catalog
 from backend.app.models.models import Relatorio, TermoTecnico, RelatorioTermo
 
 logger = logging.getLogger(__name__)
@@ -32,8 +33,7 @@ async def search_reports(
         found_terms = []
         
         # Find matching technical terms
-        all_terms = db.query(TermoTecnico).all()
-        for term in all_terms:
+        for term in get_term_catalog(db):
             if term.termo.lower() in query_lower or term.termo_normalizado.lower() in query_lower:
                 found_terms.append(term.termo_normalizado)
         
@@ -1,17 +1,23 @@
 """
 Authentication utilities using JWT
 """
+import hashlib
+import hmac
 import secrets
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional, Tuple, Union
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
-from backend.app.core.config import settings
+from backend.app.core.config import settings, SECRET_KEY_PLACEHOLDER
 from backend.app.models.models import User, MagicToken
 from backend.app.schemas.schemas import CurrentUser, TokenErrorType
 
@@ -62,25 +68,29 @@ def generate_magic_token() -> str:
     return secrets.token_urlsafe(32)
 
 
+# Magic tokens must never be hashed with the publicly known placeholder key
+if settings.TOKEN_PEPPER == SECRET_KEY_PLACEHOLDER:
+    raise RuntimeError("Set SECRET_KEY (or TOKEN_PEPPER) in the environment or .env")
+
+# Key for the magic token MAC; hashing the pepper fits any length into
+# the 64-byte BLAKE2b key limit
+_MAGIC_TOKEN_KEY = hashlib.blake2b(settings.TOKEN_PEPPER.encode(), digest_size=32).digest()
+
+
 def hash_magic_token(token: str) -> str:
-    """Hash a magic token for storage"""
-    # Bcrypt has a 72 byte limit, so we truncate the token
-    # This is safe because we're still using the full token for verification
-    truncated_token = token[:72] if len(token) > 72 else token
-    return get_password_hash(truncated_token)
+    """
+    Hash a magic token for storage
+    
+    Tokens carry 256 random bits and live a few minutes, so a keyed
+    BLAKE2b MAC is enough (no need for a slow password hash). The hash is
+    deterministic, so tokens can be looked up by it directly.
+    """
+    return hashlib.blake2b(token.encode(), key=_MAGIC_TOKEN_KEY, digest_size=16).hexdigest()
 
 
 def verify_magic_token(plain_token: str, hashed_token: str) -> bool:
-    """Verify a magic token against its hash"""
-    try:
-        # Bcrypt has a 72 byte limit, so we truncate the token for verification
-        truncated_token = plain_token[:72] if len(plain_token) > 72 else plain_token
-        result = verify_password(truncated_token, hashed_token)
-        logger.debug(f"Token verification: plain='{plain_token[:8]}...', hash='{hashed_token[:20]}...', result={result}")
-        return result
-    except Exception as e:
-        logger.error(f"Error verifying magic token: {e}")
-        return False
+    """Verify a magic token against its hash (constant-time comparison)"""
+    return hmac.compare_digest(hash_magic_token(plain_token), hashed_token)
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -123,7 +133,8 @@ def create_magic_token(
     logger.info(f"Token hashed for storage")
     
     # Create expiration time
-    expires_at = datetime.utcnow() + timedelta(minutes=settings.MAGIC_TOKEN_EXPIRE_MINUTES)
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=settings.MAGIC_TOKEN_EXPIRE_MINUTES)
     logger.info(f"Token will expire at: {expires_at}")
     
     # Check if user has ANY magic tokens (cleanup multiple if exist)
@@ -146,7 +157,7 @@ def create_magic_token(
         main_token.token = hashed_token
         main_token.expires_at = expires_at
         main_token.used_at = None  # Reset usage status
-        main_token.created_at = datetime.utcnow()  # Update creation time
+        main_token.created_at = now  # Update creation time
         main_token.ip_address = ip_address
         main_token.user_agent = user_agent
         
@@ -184,61 +195,86 @@ def verify_magic_token_with_details(db: Session, plain_token: str) -> tuple[Opti
     """Verify a magic token and return detailed error information"""
     logger.info(f"Attempting to verify magic token: {plain_token[:8]}...")
     
-    # Get all tokens to check various failure scenarios
-    all_tokens = db.query(MagicToken).all()
+    # Look up the token by its hash, together with its user, in one round-trip
+    token_hash = hash_magic_token(plain_token)
+    row = (
+        db.query(MagicToken, User)
+        .join(User, User.id == MagicToken.user_id)
+        .filter(MagicToken.token == token_hash)
+        .first()
+    )
     
-    for magic_token in all_tokens:
-        if verify_magic_token(plain_token, magic_token.token):
-            logger.info(f"Found matching token for user_id={magic_token.user_id}")
-            
-            # Check if token was already used (with grace period for double-clicks)
-            if magic_token.used_at is not None:
-                # Allow reuse within 30 seconds to handle double-clicks/race conditions
-                time_since_used = datetime.utcnow() - magic_token.used_at
-                grace_period_seconds = 30
-                
-                if time_since_used.total_seconds() <= grace_period_seconds:
-                    logger.warning(f"Token was recently used ({time_since_used.total_seconds():.1f}s ago) - allowing within grace period")
-                    # Return the same user without updating used_at again
-                    user = db.query(User).filter(User.id == magic_token.user_id).first()
-                    if user:
-                        logger.info(f"Returning user within grace period: {user.email}")
-                        return user, None
-                    else:
-                        logger.error(f"User not found for id: {magic_token.user_id}")
-                        return None, TokenErrorType.INVALID
-                else:
-                    logger.warning(f"Token was already used at: {magic_token.used_at} (outside grace period)")
-                    return None, TokenErrorType.ALREADY_USED
-            
-            # Check if token is expired
-            if magic_token.expires_at <= datetime.utcnow():
-                logger.warning(f"Token expired at: {magic_token.expires_at}")
-                return None, TokenErrorType.EXPIRED
-            
-            # Token is valid - mark as used and return user
-            logger.info(f"Token verified successfully for user_id={magic_token.user_id}")
-            magic_token.used_at = datetime.utcnow()
+    if row is not None:
+        magic_token, user = row
+        now = datetime.utcnow()
+        logger.info(f"Found matching token for user_id={magic_token.user_id}")
+        
+        # Check if token was already used (with grace period for double-clicks)
+        if magic_token.used_at is not None:
+            # Allow reuse within 30 seconds to handle double-clicks/race conditions
+            time_since_used = now - magic_token.used_at
+            grace_period_seconds = 30
             
-            # Update user's last login
-            user = db.query(User).filter(User.id == magic_token.user_id).first()
-            if user:
-                user.last_login = datetime.utcnow()
-                logger.info(f"Updated last_login for user: {user.email}")
+            if time_since_used.total_seconds() <= grace_period_seconds:
+                logger.warning(f"Token was recently used ({time_since_used.total_seconds():.1f}s ago) - allowing within grace period")
+                # Return the same user without updating used_at again
+                logger.info(f"Returning user within grace period: {user.email}")
+                return user, None
             else:
-                logger.error(f"User not found for id: {magic_token.user_id}")
-                return None, TokenErrorType.INVALID
-            
-            db.commit()
-            return user, None
+                logger.warning(f"Token was already used at: {magic_token.used_at} (outside grace period)")
+                return None, TokenErrorType.ALREADY_USED
+        
+        # Check if token is expired
+        if magic_token.expires_at <= now:
+            logger.warning(f"Token expired at: {magic_token.expires_at}")
+            return None, TokenErrorType.EXPIRED
+        
+        # Token is valid - claim it atomically; if a concurrent request
+        # claimed it first, it was used just now (within the grace period)
+        logger.info(f"Token verified successfully for user_id={magic_token.user_id}")
+        db.execute(
+            update(MagicToken)
+            .where(MagicToken.id == magic_token.id, MagicToken.used_at.is_(None))
+            .values(used_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Update user's last login
+        user.last_login = now
+        logger.info(f"Updated last_login for user: {user.email}")
+        
+        db.commit()
+        return user, None
     
     # No matching token found
     logger.warning(f"No matching token found for provided magic token")
     return None, TokenErrorType.NOT_FOUND
 
 
+# Recently verified JWTs, so repeated requests with the same token skip the
+# signature check and the user lookup. LRU ordered, entries live at most
+# VERIFIED_TOKEN_TTL_SECONDS and never past the token's own expiration.
+# A user deactivated or deleted in the database keeps authenticating with
+# an already verified token for up to VERIFIED_TOKEN_TTL_SECONDS, unless the
+# code making that change calls invalidate_verified_tokens().
+VERIFIED_TOKEN_CACHE_SIZE = 10_000
+VERIFIED_TOKEN_TTL_SECONDS = 60
+
+_verified_tokens: "OrderedDict[bytes, Tuple[float, CurrentUser]]" = OrderedDict()
+_verified_tokens_lock = threading.Lock()
+
+
 def get_current_user_from_token(db: Session, token: str) -> Optional[CurrentUser]:
     """Get current user from JWT token"""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    with _verified_tokens_lock:
+        cached = _verified_tokens.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                _verified_tokens.move_to_end(key)
+                return cached[1]
+            del _verified_tokens[key]
+    
     payload = verify_token(token)
     if payload is None:
         return None
@@ -251,12 +287,30 @@ def get_current_user_from_token(db: Session, token: str) -> Optional[CurrentUser
     if user is None or not user.is_active:
         return None
     
-    return CurrentUser(
+    current_user = CurrentUser(
         id=user.id,
         email=user.email,
         full_name=user.full_name,
         is_active=bool(user.is_active)
     )
+    
+    ttl = VERIFIED_TOKEN_TTL_SECONDS
+    if isinstance(payload.get("exp"), (int, float)):
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        with _verified_tokens_lock:
+            _verified_tokens[key] = (time.monotonic() + ttl, current_user)
+            _verified_tokens.move_to_end(key)
+            while len(_verified_tokens) > VERIFIED_TOKEN_CACHE_SIZE:
+                _verified_tokens.popitem(last=False)
+    
+    return current_user
+
+
+def invalidate_verified_tokens() -> None:
+    """Drop all cached JWT verifications (e.g. after deactivating a user)"""
+    with _verified_tokens_lock:
+        _verified_tokens.clear()
 
 
 def authenticate_user(db: Session, email: str) -> Optional[User]:
@@ -274,32 +328,24 @@ def cleanup_expired_tokens(db: Session) -> dict:
     
     Returns statistics about cleanup.
     """
-    # Count tokens before cleanup
-    expired_tokens_count = db.query(MagicToken).filter(
-        MagicToken.expires_at < datetime.utcnow()
-    ).count()
+    # One reference time for every condition, so counts and deletes agree
+    now = datetime.utcnow()
     
-    # Delete expired tokens
-    db.query(MagicToken).filter(
-        MagicToken.expires_at < datetime.utcnow()
-    ).delete()
+    # Delete expired tokens (delete() returns the number of rows removed)
+    expired_tokens_count = db.query(MagicToken).filter(
+        MagicToken.expires_at < now
+    ).delete(synchronize_session=False)
     
-    # Mark very old used tokens (older than 30 days) for potential cleanup
+    # Optional: Delete very old used tokens (older than 30 days) to keep database clean
     old_used_tokens_count = db.query(MagicToken).filter(
         MagicToken.used_at.is_not(None),
-        MagicToken.used_at < datetime.utcnow() - timedelta(days=30)
-    ).count()
-    
-    # Optional: Delete very old used tokens to keep database clean
-    db.query(MagicToken).filter(
-        MagicToken.used_at.is_not(None),
-        MagicToken.used_at < datetime.utcnow() - timedelta(days=30)
-    ).delete()
+        MagicToken.used_at < now - timedelta(days=30)
+    ).delete(synchronize_session=False)
     
     db.commit()
     
     return {
         "expired_tokens_deleted": expired_tokens_count,
         "old_used_tokens_deleted": old_used_tokens_count,
-        "cleanup_timestamp": datetime.utcnow().isoformat()
+        "cleanup_timestamp": now.isoformat()
     }
\ No newline at end of file
@@ -2,10 +2,17 @@
 Configuration settings for the application
 """
 import os
+from functools import lru_cache
 from typing import Optional
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
+# Default SECRET_KEY; never acceptable as the magic token hashing key
+# (enforced by backend.app.core.auth, which issues and verifies tokens)
+SECRET_KEY_PLACEHOLDER = "your-secret-key-change-in-production"
+
+
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = os.getenv(
@@ -26,7 +33,9 @@ class Settings(BaseSettings):
     CORS_ORIGINS: list = ["http://localhost:5173", "http://localhost:3000","https://estagiosv2.pcs.usp.br",'http://localhost','http://200.144.245.12:50100','http://localhost:50100']
     
     # Authentication
-    SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
+    SECRET_KEY: str = os.getenv("SECRET_KEY", SECRET_KEY_PLACEHOLDER)
+    # Key for hashing stored magic tokens (defaults to SECRET_KEY)
+    TOKEN_PEPPER: Optional[str] = None
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))  # 24 hours
     MAGIC_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("MAGIC_TOKEN_EXPIRE_MINUTES", "15"))  # 15 minutes
@@ -43,9 +52,25 @@ class Settings(BaseSettings):
     # Frontend URL for magic links
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:5173")
     
+    @model_validator(mode="after")
+    def resolve_token_pepper(self):
+        """Default TOKEN_PEPPER to the resolved SECRET_KEY (environment or .env)"""
+        if not self.TOKEN_PEPPER:
+            self.TOKEN_PEPPER = self.SECRET_KEY
+        return self
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Get application settings, validated once per process.
+    Can be used as a FastAPI dependency and overridden in tests.
+    """
+    return Settings()
+
+
+settings = get_settings()
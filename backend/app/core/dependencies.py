@@ -1,80 +1,142 @@
 """
 Authentication middleware and dependencies
 """
+import base64
+import binascii
+import json
+from functools import lru_cache
 from typing import Optional
 from fastapi import Depends, HTTPException, status, Request
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from backend.app.db.database import get_db
 from backend.app.core.auth import get_current_user_from_token
+from backend.app.core.config import settings
 from backend.app.schemas.schemas import CurrentUser
 
 
-# Security scheme for JWT Bearer tokens
-security = HTTPBearer(auto_error=False)
+def get_bearer_token(request: Request) -> Optional[str]:
+    """
+    Extract the JWT from the Authorization header.
+    Returns None if the header is missing or is not a Bearer credential.
+    """
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    
+    return token
+
+
+# Shared 401 response details; the exception itself is created per request,
+# since a raised instance keeps the request's frames in its __traceback__
+NOT_AUTHENTICATED_HEADERS = {"WWW-Authenticate": "Bearer"}
+NOT_AUTHENTICATED_DETAIL = "Not authenticated"
+INVALID_CREDENTIALS_DETAIL = "Invalid authentication credentials"
+
+
+def unauthorized(detail: str) -> HTTPException:
+    """Build a new 401 exception with the Bearer challenge header"""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers=NOT_AUTHENTICATED_HEADERS,
+    )
+
+
+@lru_cache(maxsize=256)
+def get_token_algorithm(header_segment: str) -> Optional[str]:
+    """
+    Decode the base64url JWT header segment and return its "alg" claim.
+    Returns None if the header is not valid base64/JSON.
+    Cached since every token issued by us shares the same header.
+    """
+    try:
+        header = json.loads(base64.urlsafe_b64decode(header_segment + "=" * (-len(header_segment) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    
+    if not isinstance(header, dict):
+        return None
+    return header.get("alg")
+
+
+def is_plausible_token(token: str) -> bool:
+    """
+    Cheap structural check run before signature verification, so malformed
+    tokens are rejected without computing the HMAC or touching the database.
+    """
+    if token.count(".") != 2:
+        return False
+    
+    header_segment = token.partition(".")[0]
+    return get_token_algorithm(header_segment) == settings.ALGORITHM
 
 
 async def get_current_user(
     request: Request,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
 ) -> CurrentUser:
     """
     Dependency to get current authenticated user from JWT token.
     Raises HTTPException if user is not authenticated.
     """
-    if not credentials:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    token = get_bearer_token(request)
+    if not token:
+        raise unauthorized(NOT_AUTHENTICATED_DETAIL)
     
-    user = get_current_user_from_token(db, credentials.credentials)
+    user = get_current_user_from_token(db, token) if is_plausible_token(token) else None
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise unauthorized(INVALID_CREDENTIALS_DETAIL)
     
     return user
 
 
 async def get_current_user_optional(
     request: Request,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
 ) -> Optional[CurrentUser]:
     """
     Dependency to optionally get current authenticated user from JWT token.
     Returns None if user is not authenticated (doesn't raise exception).
     """
-    if not credentials:
+    token = get_bearer_token(request)
+    if not token or not is_plausible_token(token):
         return None
     
-    return get_current_user_from_token(db, credentials.credentials)
+    return get_current_user_from_token(db, token)
 
 
 def get_client_ip(request: Request) -> str:
-    """Extract client IP address from request"""
+    """Extract client IP address from request (cached per request)"""
+    cached = getattr(request.state, "client_ip", None)
+    if cached is not None:
+        return cached
+    
     # Check for X-Forwarded-For header (when behind a proxy)
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
         # Take the first IP in case of multiple proxies
-        return forwarded_for.split(",")[0].strip()
-    
-    # Check for X-Real-IP header
-    real_ip = request.headers.get("X-Real-IP")
-    if real_ip:
-        return real_ip
+        client_ip = forwarded_for.partition(",")[0].strip()
+    else:
+        # Check for X-Real-IP header, then fall back to client IP
+        client_ip = request.headers.get("X-Real-IP") or (
+            request.client.host if request.client else "unknown"
+        )
     
-    # Fall back to client IP
-    client_host = request.client.host if request.client else "unknown"
-    return client_host
+    request.state.client_ip = client_ip
+    return client_ip
 
 
 def get_user_agent(request: Request) -> str:
-    """Extract user agent from request"""
-    return request.headers.get("User-Agent", "unknown")
\ No newline at end of file
+    """Extract user agent from request (cached per request)"""
+    cached = getattr(request.state, "user_agent", None)
+    if cached is not None:
+        return cached
+    
+    user_agent = request.headers.get("User-Agent", "unknown")
+    request.state.user_agent = user_agent
+    return user_agent
@@ -1,9 +1,17 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Sequence, Tuple
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
+import psycopg2
+from psycopg2.extras import execute_values
+from pgvector import HalfVector
+from pgvector.psycopg2 import register_vector
 from backend.app.core.config import settings
 from backend.app.models.models import Base
 
@@ -14,6 +22,36 @@ engine = create_engine(
     echo=settings.DEBUG,  # Log SQL statements in debug mode
 )
 
+# Async engine (asyncpg) for code running inside an event loop, so
+# awaiting database calls yields to other tasks instead of blocking
+async_engine = create_async_engine(
+    make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg"),
+    poolclass=NullPool,
+    echo=settings.DEBUG,
+)
+
+_pgvector_registered = False
+
+
+@event.listens_for(engine, "connect")
+def register_pgvector_types(dbapi_connection, connection_record):
+    """
+    Register the pgvector adapters/typecasters once per process so numpy
+    arrays and HalfVector objects can be bound directly as query parameters.
+    """
+    global _pgvector_registered
+    if _pgvector_registered:
+        return
+    try:
+        register_vector(dbapi_connection, globally=True)
+        _pgvector_registered = True
+    except psycopg2.ProgrammingError:
+        # vector extension not created yet (e.g. during database setup)
+        pass
+    finally:
+        dbapi_connection.rollback()
+
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -30,11 +68,173 @@ def get_db() -> Session:
         db.close()
 
 
+# Async session factory; objects stay usable after commit without a reload
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Get async database session
+    Async counterpart of get_db
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@contextmanager
+def raw_conn():
+    """
+    Get a raw DBAPI (psycopg2) connection for bulk operations.
+    Commits on success and rolls back on error.
+    """
+    conn = engine.raw_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def bulk_insert_embeddings(
+    rows: Iterable[Tuple[int, str, str, Sequence[float], str]],
+    page_size: int = 500
+) -> int:
+    """
+    Bulk insert relatorio_embeddings rows with a single multi-row INSERT
+    per page instead of one ORM flush per object.
+    
+    Args:
+        rows: (relatorio_id, secao, conteudo, embedding, modelo) tuples
+        page_size: Number of rows per INSERT statement
+    
+    Returns:
+        Number of rows inserted
+    """
+    values = [
+        (relatorio_id, secao, conteudo, HalfVector(embedding).to_text(), modelo)
+        for relatorio_id, secao, conteudo, embedding, modelo in rows
+    ]
+    if not values:
+        return 0
+    
+    with raw_conn() as conn:
+        with conn.cursor() as cursor:
+            execute_values(
+                cursor,
+                "INSERT INTO relatorio_embeddings (relatorio_id, secao, conteudo, embedding, modelo) VALUES %s",
+                values,
+                template="(%s, %s, %s, %s::halfvec, %s)",
+                page_size=page_size
+            )
+    
+    return len(values)
+
+
+def bulk_insert_report_terms(
+    rows: Sequence[Tuple[int, int, str, int]],
+    page_size: int = 1000
+) -> int:
+    """
+    Bulk insert relatorio_termos rows with multi-row INSERT statements
+    
+    Args:
+        rows: (relatorio_id, termo_id, secao, frequencia) tuples
+        page_size: Number of rows per INSERT statement
+    
+    Returns:
+        Number of rows inserted
+    """
+    if not rows:
+        return 0
+    
+    with raw_conn() as conn:
+        with conn.cursor() as cursor:
+            # Derived rows that can be regenerated: don't wait for the WAL
+            # flush on commit (this transaction only)
+            cursor.execute("SET LOCAL synchronous_commit = off")
+            execute_values(
+                cursor,
+                "INSERT INTO relatorio_termos (relatorio_id, termo_id, secao, frequencia) VALUES %s",
+                rows,
+                page_size=page_size
+            )
+    
+    return len(rows)
+
+
+def fetch_cached_embeddings(hashes: Sequence[bytes], modelo: str) -> Dict[bytes, List[float]]:
+    """
+    Look up embedding_cache rows for the given content hashes
+    
+    Args:
+        hashes: Content hashes to look up
+        modelo: Embedding model the vectors were generated with
+    
+    Returns:
+        Dictionary mapping each cached hash to its embedding
+    """
+    if not hashes:
+        return {}
+    
+    with raw_conn() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT hash, embedding FROM embedding_cache WHERE modelo = %s AND hash = ANY(%s)",
+                (modelo, [psycopg2.Binary(h) for h in hashes])
+            )
+            return {bytes(h): embedding.to_list() for h, embedding in cursor.fetchall()}
+
+
+def store_cached_embeddings(
+    rows: Iterable[Tuple[bytes, Sequence[float]]],
+    modelo: str,
+    page_size: int = 500
+) -> None:
+    """
+    Insert (hash, embedding) pairs into embedding_cache; hashes that are
+    already cached (e.g. stored by a concurrent run) are left untouched.
+    """
+    values = [
+        (psycopg2.Binary(h), modelo, HalfVector(embedding).to_text())
+        for h, embedding in rows
+    ]
+    if not values:
+        return
+    
+    with raw_conn() as conn:
+        with conn.cursor() as cursor:
+            execute_values(
+                cursor,
+                "INSERT INTO embedding_cache (hash, modelo, embedding) VALUES %s "
+                "ON CONFLICT (hash, modelo) DO NOTHING",
+                values,
+                template="(%s, %s, %s::halfvec)",
+                page_size=page_size
+            )
+
+
 def init_db():
     """
-    Initialize database - create all tables
+    Initialize database - create required extensions and all tables
+    """
+    # Extensions and tables on one connection, in a single transaction
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        Base.metadata.create_all(bind=conn)
+
+
+async def init_db_async():
+    """
+    Initialize database through the async engine
     """
-    Base.metadata.create_all(bind=engine)
+    async with async_engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(Base.metadata.create_all)
 
 
 def drop_all_tables():
@@ -1,16 +1,16 @@
 """
 Database models using SQLAlchemy with pgvector support
 """
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime, 
+    Column, Integer, String, Text, DateTime, LargeBinary,
     ForeignKey, CheckConstraint, UniqueConstraint,
-    Enum, JSON
+    Enum, Index, func, text
 )
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import HALFVEC
 import uuid
 import enum
 
@@ -18,6 +18,16 @@ import enum
 Base = declarative_base()
 
 
+def utc_now():
+    """Server-side UTC timestamp (naive, same as values from datetime.utcnow)"""
+    return func.timezone('UTC', func.now())
+
+
+def utcnow() -> datetime:
+    """Python-side naive UTC timestamp, without the deprecated datetime.utcnow()"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class CursoEnum(str, enum.Enum):
     """Enum for course types"""
     COMPUTACAO = "Engenharia de Computação"
@@ -75,8 +85,8 @@ class Relatorio(Base):
     arquivo_origem = Column(String(255))  # Original JSON filename
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now())
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now())
     
     # Relationships
     embeddings = relationship("RelatorioEmbedding", back_populates="relatorio", cascade="all, delete-orphan")
@@ -86,6 +96,12 @@ class Relatorio(Base):
     __table_args__ = (
         CheckConstraint('ordinal_estagio BETWEEN 1 AND 5', name='check_ordinal_estagio'),
         CheckConstraint('ano >= 2020 AND ano <= 2030', name='check_ano_valido'),
+        # Trigram index so ILIKE '%company%' searches don't scan the table (requires pg_trgm)
+        Index(
+            'ix_relatorios_empresa_trgm', 'empresa_razao_social',
+            postgresql_using='gin',
+            postgresql_ops={'empresa_razao_social': 'gin_trgm_ops'}
+        ),
     )
 
 
@@ -101,14 +117,35 @@ class RelatorioEmbedding(Base):
     conteudo = Column(Text, nullable=False)
     
     # Vector embedding
-    embedding = Column(Vector(1536)) # Assuming 1536-dimensional embeddings
+    embedding = Column(HALFVEC(1536)) # 1536-dimensional embeddings stored as FP16
     modelo = Column(String(50), default='gemini-embedding-001')
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now())
     
     # Relationships
     relatorio = relationship("Relatorio", back_populates="embeddings")
+    
+    # Indexes (the IVFFlat ANN index needs loaded embeddings to train its
+    # lists, so it is built by backend/migrate_embedding_indexes.py)
+    __table_args__ = (
+        # Per-report / per-section lookups
+        Index('ix_embedding_relatorio_secao', 'relatorio_id', 'secao'),
+    )
+
+
+class EmbeddingCache(Base):
+    """Embeddings by content hash, shared across reports and script runs"""
+    __tablename__ = 'embedding_cache'
+    
+    # blake2b digest of the embedded text
+    hash = Column(LargeBinary, primary_key=True)
+    modelo = Column(String(50), primary_key=True)
+    
+    embedding = Column(HALFVEC(1536), nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime, server_default=utc_now())
 
 
 class TermoTecnico(Base):
@@ -122,10 +159,10 @@ class TermoTecnico(Base):
     
     # Additional metadata
     descricao = Column(Text)
-    sinonimos = Column(JSON)  # List of synonyms
+    sinonimos = Column(JSONB)  # List of synonyms
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now())
     
     # Relationships
     relatorios = relationship("RelatorioTermo", back_populates="termo")
@@ -133,6 +170,7 @@ class TermoTecnico(Base):
     # Constraints
     __table_args__ = (
         UniqueConstraint('termo', 'tipo', name='unique_termo_tipo'),
+        Index('ix_termos_sinonimos_gin', 'sinonimos', postgresql_using='gin'),
     )
 
 
@@ -148,7 +186,7 @@ class RelatorioTermo(Base):
     contexto = Column(Text)  # Optional context where term was found
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now())
     
     # Relationships
     relatorio = relationship("Relatorio", back_populates="termos")
@@ -166,8 +204,8 @@ class ChatSession(Base):
     user_identifier = Column(String(100))  # will be email with a sufix @usp.br
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now())
+    updated_at = Column(DateTime, server_default=utc_now(), onupdate=utc_now())
     
     # Relationships
     messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
@@ -187,10 +225,15 @@ class ChatMessage(Base):
     message_metadata = Column(JSONB)
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utc_now())
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
+    
+    # Indexes
+    __table_args__ = (
+        Index('ix_chat_messages_session', 'session_id', 'created_at'),
+    )
 
 
 class User(Base):
@@ -205,12 +248,16 @@ class User(Base):
     is_active = Column(Integer, default=1)  # 1 for active, 0 for inactive
     
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
     last_login = Column(DateTime)
     
     # Relationships
-    magic_tokens = relationship("MagicToken", back_populates="user", cascade="all, delete-orphan")
+    # Deleting a user leaves token removal to ON DELETE CASCADE instead of
+    # loading every token first
+    magic_tokens = relationship(
+        "MagicToken", back_populates="user", cascade="all, delete-orphan", passive_deletes=True
+    )
     
     # Constraints - only @usp.br emails allowed
     __table_args__ = (
@@ -231,7 +278,7 @@ class MagicToken(Base):
     used_at = Column(DateTime)  # When token was used
     
     # Creation metadata
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=utcnow)
     ip_address = Column(String(45))  # Support IPv6
     user_agent = Column(Text)
     
@@ -241,4 +288,9 @@ class MagicToken(Base):
     # Constraints
     __table_args__ = (
         CheckConstraint('expires_at > created_at', name='check_expires_after_creation'),
+        # Unused tokens by expiration (valid/expired counts and cleanup)
+        Index(
+            'ix_magic_tokens_active', 'expires_at',
+            postgresql_where=text('used_at IS NULL')
+        ),
     )
@@ -1,10 +1,33 @@
 """
 Pydantic schemas for API requests and responses
 """
-from pydantic import BaseModel, Field, EmailStr, validator
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
+import string
+
+
+# Institutional email domains accepted for login (lowercase)
+ALLOWED_EMAIL_DOMAINS = frozenset({'usp.br'})
+
+# Characters allowed in the local part (before the @)
+EMAIL_LOCAL_PART_CHARS = string.ascii_letters + string.digits + '._%+-'
+
+
+def validate_usp_email(value: str) -> str:
+    """Validate that an email is a well-formed @usp.br address"""
+    value = value.strip()
+    # Plain string operations: split on the last @, look the domain up in
+    # the set, and strip the allowed characters to find any other one
+    local, _, domain = value.rpartition('@')
+    if (
+        not local
+        or domain.lower() not in ALLOWED_EMAIL_DOMAINS
+        or local.strip(EMAIL_LOCAL_PART_CHARS)
+    ):
+        raise ValueError('Email must be from @usp.br domain')
+    return value
 
 
 class ChatRole(str, Enum):
@@ -28,6 +51,10 @@ class ChatMessage(BaseModel):
     content: str
     timestamp: Optional[datetime] = None
     metadata: Optional[Dict[str, Any]] = None
+    
+    class Config:
+        extra = "forbid"
+        frozen = True
 
 
 class ChatRequest(BaseModel):
@@ -37,6 +64,8 @@ class ChatRequest(BaseModel):
     context_limit: Optional[int] = Field(default=3, ge=1, le=10)
     
     class Config:
+        extra = "forbid"
+        frozen = True
         json_schema_extra = {
             "example": {
                 "message": "Qual a linguagem de programação mais usada em 2025?",
@@ -54,6 +83,8 @@ class ChatResponse(BaseModel):
     confidence: Optional[float] = Field(None, ge=0.0, le=1.0)
     
     class Config:
+        extra = "forbid"
+        frozen = True
         json_schema_extra = {
             "example": {
                 "response": "Em 2025, Python foi a linguagem mais utilizada nos estágios, seguida por JavaScript e Java.",
@@ -158,13 +189,12 @@ class ErrorResponse(BaseModel):
 
 class MagicLinkRequest(BaseModel):
     """Request for magic link"""
-    email: EmailStr = Field(..., description="Email address (must be @usp.br domain)")
+    email: str = Field(..., description="Email address (must be @usp.br domain)")
     
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def validate_usp_email(cls, v):
-        if not v.endswith('@usp.br'):
-            raise ValueError('Email must be from @usp.br domain')
-        return v
+        return validate_usp_email(v)
     
     class Config:
         json_schema_extra = {
@@ -236,6 +266,7 @@ class UserResponse(BaseModel):
     last_login: Optional[datetime] = None
     
     class Config:
+        frozen = True
         from_attributes = True
         json_schema_extra = {
             "example": {
@@ -251,19 +282,22 @@ class UserResponse(BaseModel):
 
 class UserCreate(BaseModel):
     """User creation schema"""
-    email: EmailStr
+    email: str
     full_name: Optional[str] = None
     
-    @validator('email')
+    @field_validator('email')
+    @classmethod
     def validate_usp_email(cls, v):
-        if not v.endswith('@usp.br'):
-            raise ValueError('Email must be from @usp.br domain')
-        return v
+        return validate_usp_email(v)
 
 
 class CurrentUser(BaseModel):
-    """Current authenticated user"""
+    """Current authenticated user (immutable, safe to cache and share)"""
     id: int
     email: str
     full_name: Optional[str] = None
     is_active: bool
+    
+    class Config:
+        frozen = True
+        from_attributes = True
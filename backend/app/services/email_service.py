@@ -1,18 +1,120 @@
 """
 Email service for sending magic links
 """
+import asyncio
 import smtplib
 import logging
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
-from jinja2 import Template
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 from backend.app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+# Maximum number of SMTP connections open at the same time
+SMTP_POOL_SIZE = 4
+
+# Pooled connections idle for longer than this are checked with NOOP before reuse
+SMTP_IDLE_CHECK_SECONDS = 60
+
+
+# Plain text body for magic link emails, filled in with str.format
+MAGIC_LINK_TEXT_TEMPLATE = """
+Conversa Estágios - Acesso ao Sistema
+
+Olá, {name}!
+
+Você solicitou acesso ao sistema Conversa Estágios.
+Clique no link abaixo para fazer login:
+
+{magic_url}
+
+⚠️ Este link expira em {expires_minutes} minutos.
+
+Se você não solicitou este acesso, pode ignorar este email com segurança.
+
+---
+Conversa Estágios - Universidade de São Paulo
+Sistema para consulta de dados de estágios de Engenharia Elétrica
+""".strip()
+
+
+# HTML body for magic link emails, rendered with Jinja2
+MAGIC_LINK_HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Acesso ao Bate papo com os Relatórios de Estágio</title>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background-color: #1a365d; color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; background-color: #f8f9fa; }
+        .button { 
+            display: inline-block; 
+            background-color: #3182ce; 
+            color: white; 
+            padding: 12px 24px; 
+            text-decoration: none; 
+            border-radius: 5px; 
+            margin: 20px 0; 
+        }
+        .footer { padding: 20px; text-align: center; color: #666; font-size: 12px; }
+        .warning { color: #e53e3e; font-weight: bold; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Bate papo com os Relatórios de Estágio</h1>
+            <p>Sistema de Consulta de Relatórios de Estágio</p>
+        </div>
+
+        <div class="content">
+            <h2>Olá, {{ name }}!</h2>
+
+            <p>Você solicitou acesso ao sistema <strong>Bate papo com os Relatórios de Estágio</strong>. 
+            Clique no botão abaixo para fazer login:</p>
+
+            <div style="text-align: center;">
+                <a href="{{ magic_url }}" class="button">Acessar Sistema</a>
+            </div>
+
+            <p>Ou copie e cole este link no seu navegador:</p>
+            <p style="word-break: break-all; background-color: #e2e8f0; padding: 10px; border-radius: 5px;">
+                {{ magic_url }}
+            </p>
+
+            <p class="warning">⚠️ Este link expira em {{ expires_minutes }} minutos.</p>
+
+            <p>Se você não solicitou este acesso, pode ignorar este email com segurança.</p>
+        </div>
+
+        <div class="footer">
+            <p>Conversa Estágios - Universidade de São Paulo<br>
+            Sistema para consulta de dados de estágios de Engenharia Elétrica</p>
+        </div>
+    </div>
+</body>
+</html>
+""".strip()
+
+
+@lru_cache(maxsize=1)
+def _magic_link_html_template():
+    """Compile the magic link HTML template once, on first use"""
+    # Imported lazily so workers that never send email don't pay for Jinja2
+    from jinja2 import Template
+    
+    return Template(MAGIC_LINK_HTML_TEMPLATE)
+
+
 class EmailService:
     """Email service for sending notifications"""
     
@@ -23,6 +125,13 @@ class EmailService:
         self.password = settings.SMTP_PASSWORD
         self.from_email = settings.FROM_EMAIL
         self.from_name = settings.FROM_NAME
+        self._from_header = f"{self.from_name} <{self.from_email}>"
+        
+        # Pool of persistent SMTP connections, reused across sends; at most
+        # SMTP_POOL_SIZE are open (and sending) at the same time
+        self._idle_smtp: List[Tuple[smtplib.SMTP, float]] = []
+        self._smtp_lock = threading.Lock()
+        self._smtp_slots = threading.BoundedSemaphore(SMTP_POOL_SIZE)
     
     async def send_magic_link(self, to_email: str, magic_token: str, full_name: Optional[str] = None) -> bool:
         """Send magic link email"""
@@ -72,7 +181,7 @@ class EmailService:
             # Create message
             message = MIMEMultipart("alternative")
             message["Subject"] = subject
-            message["From"] = f"{self.from_name} <{self.from_email}>"
+            message["From"] = self._from_header
             message["To"] = to_email
             
             # Add text and HTML parts
@@ -82,13 +191,10 @@ class EmailService:
             message.attach(text_part)
             message.attach(html_part)
             
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                if self.username and self.password:
-                    server.login(self.username, self.password)
-                
-                server.send_message(message)
+            # Send email in a worker thread so the SMTP round-trip
+            # doesn't block the event loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._send_email_sync, message)
             
             logger.info(f"Magic link email sent successfully to {to_email}")
             return True
@@ -97,6 +203,71 @@ class EmailService:
             logger.error(f"Failed to send email to {to_email}: {e}")
             return False
     
+    def _connect_smtp(self) -> smtplib.SMTP:
+        """Open a new authenticated SMTP connection"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return server
+    
+    @staticmethod
+    def _close_smtp(server: smtplib.SMTP) -> None:
+        """Close an SMTP connection, ignoring errors on close"""
+        try:
+            server.quit()
+        except smtplib.SMTPException:
+            pass
+        except OSError:
+            pass
+    
+    def _acquire_smtp(self) -> smtplib.SMTP:
+        """
+        Take an idle connection from the pool, or open a new one.
+        Connections idle for longer than SMTP_IDLE_CHECK_SECONDS are
+        checked with NOOP first and dropped if the server closed them.
+        """
+        while True:
+            with self._smtp_lock:
+                if not self._idle_smtp:
+                    break
+                server, last_used = self._idle_smtp.pop()
+            
+            if time.monotonic() - last_used < SMTP_IDLE_CHECK_SECONDS:
+                return server
+            try:
+                status_code, _ = server.noop()
+                if status_code == 250:
+                    return server
+            except (smtplib.SMTPServerDisconnected, OSError):
+                pass
+            self._close_smtp(server)
+        
+        return self._connect_smtp()
+    
+    def _release_smtp(self, server: smtplib.SMTP) -> None:
+        """Return a healthy connection to the pool"""
+        with self._smtp_lock:
+            self._idle_smtp.append((server, time.monotonic()))
+    
+    def _send_email_sync(self, message: MIMEMultipart) -> None:
+        """Deliver a prepared message over a pooled SMTP connection"""
+        with self._smtp_slots:
+            server = self._acquire_smtp()
+            try:
+                try:
+                    server.send_message(message)
+                except smtplib.SMTPServerDisconnected:
+                    # Server closed the session while it sat in the pool;
+                    # retry once on a fresh connection
+                    self._close_smtp(server)
+                    server = self._connect_smtp()
+                    server.send_message(message)
+            except BaseException:
+                self._close_smtp(server)
+                raise
+            self._release_smtp(server)
+    
     def _create_magic_link_html(
         self, 
         to_email: str, 
@@ -107,67 +278,7 @@ class EmailService:
         """Create HTML email content for magic link"""
         name = full_name or to_email.split('@')[0].title()
         
-        html_template = Template("""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Acesso ao Bate papo com os Relatórios de Estágio</title>
-            <style>
-                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
-                .container { max-width: 600px; margin: 0 auto; padding: 20px; }
-                .header { background-color: #1a365d; color: white; padding: 20px; text-align: center; }
-                .content { padding: 20px; background-color: #f8f9fa; }
-                .button { 
-                    display: inline-block; 
-                    background-color: #3182ce; 
-                    color: white; 
-                    padding: 12px 24px; 
-                    text-decoration: none; 
-                    border-radius: 5px; 
-                    margin: 20px 0; 
-                }
-                .footer { padding: 20px; text-align: center; color: #666; font-size: 12px; }
-                .warning { color: #e53e3e; font-weight: bold; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Bate papo com os Relatórios de Estágio</h1>
-                    <p>Sistema de Consulta de Relatórios de Estágio</p>
-                </div>
-                
-                <div class="content">
-                    <h2>Olá, {{ name }}!</h2>
-                    
-                    <p>Você solicitou acesso ao sistema <strong>Bate papo com os Relatórios de Estágio</strong>. 
-                    Clique no botão abaixo para fazer login:</p>
-                    
-                    <div style="text-align: center;">
-                        <a href="{{ magic_url }}" class="button">Acessar Sistema</a>
-                    </div>
-                    
-                    <p>Ou copie e cole este link no seu navegador:</p>
-                    <p style="word-break: break-all; background-color: #e2e8f0; padding: 10px; border-radius: 5px;">
-                        {{ magic_url }}
-                    </p>
-                    
-                    <p class="warning">⚠️ Este link expira em {{ expires_minutes }} minutos.</p>
-                    
-                    <p>Se você não solicitou este acesso, pode ignorar este email com segurança.</p>
-                </div>
-                
-                <div class="footer">
-                    <p>Conversa Estágios - Universidade de São Paulo<br>
-                    Sistema para consulta de dados de estágios de Engenharia Elétrica</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """)
-        
-        return html_template.render(
+        return _magic_link_html_template().render(
             name=name,
             magic_url=magic_url,
             expires_minutes=expires_minutes
@@ -183,25 +294,14 @@ class EmailService:
         """Create plain text email content for magic link"""
         name = full_name or to_email.split('@')[0].title()
         
-        return f"""
-Conversa Estágios - Acesso ao Sistema
-
-Olá, {name}!
-
-Você solicitou acesso ao sistema Conversa Estágios.
-Clique no link abaixo para fazer login:
-
-{magic_url}
-
-⚠️ Este link expira em {expires_minutes} minutos.
-
-Se você não solicitou este acesso, pode ignorar este email com segurança.
-
----
-Conversa Estágios - Universidade de São Paulo
-Sistema para consulta de dados de estágios de Engenharia Elétrica
-        """.strip()
+        return MAGIC_LINK_TEXT_TEMPLATE.format(
+            name=name,
+            magic_url=magic_url,
+            expires_minutes=expires_minutes
+        )
 
 
-# Global email service instance
-email_service = EmailService()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_email_service() -> EmailService:
+    """Get the shared email service instance, creating it on first use"""
+    return EmailService()
\ No newline at end of file
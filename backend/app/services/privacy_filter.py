@@ -1,33 +1,58 @@
 """
 Privacy filter service to remove personal information from responses
 """
+from functools import lru_cache
+from itertools import islice
 from typing import Dict, Any, List
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Marker for dictionary entries dropped by filter_dict
+_REMOVED = object()
+# Marker for "no nested container result waiting" in _filter_tree
+_PENDING = object()
+
 
 class PrivacyFilter:
     """Service to filter out personal information from data"""
     
     # Patterns to detect personal information
-    EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-    PHONE_PATTERN = re.compile(r'\b(?:\+55\s?)?(?:\(?\d{2}\)?\s?)?(?:\d{4,5}[-.\s]?\d{4})\b')
+    # Possessive quantifiers (Python 3.11+) keep matching linear on untrusted text,
+    # and the lookbehind only starts an email at the beginning of a local-part run
+    EMAIL_PATTERN = re.compile(r'(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]++@(?:[A-Za-z0-9-]++\.)+[A-Za-z]{2,}\b')
+    PHONE_PATTERN = re.compile(r'\b(?:\+55\s?+)?(?:\(?\d{2}\)?\s?+)?\d{4,5}[-.\s]?+\d{4}\b')
     CPF_PATTERN = re.compile(r'\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b')
     NUSP_PATTERN = re.compile(r'\b\d{7,8}\b')  # USP student number
     
-    # Fields to always remove
-    SENSITIVE_FIELDS = {
+    # Single-pass pattern for filter_string; alternatives are tried in the
+    # same order the individual substitutions used to run (email, phone, CPF)
+    COMBINED_PATTERN = re.compile(
+        f'(?P<EMAIL>{EMAIL_PATTERN.pattern})'
+        f'|(?P<PHONE>{PHONE_PATTERN.pattern})'
+        f'|(?P<CPF>{CPF_PATTERN.pattern})'
+    )
+    REPLACEMENTS = {
+        'EMAIL': '[EMAIL_REMOVED]',
+        'PHONE': '[PHONE_REMOVED]',
+        'CPF': '[CPF_REMOVED]',
+    }
+    
+    # Fields to always remove (already lowercase)
+    SENSITIVE_FIELDS = frozenset({
         'nome_completo', 'nome', 'email', 'telefone', 'phone',
         'cpf', 'rg', 'nusp', 'endereco', 'address'
-    }
+    })
     
     @classmethod
     def filter_dict(cls, data: Dict[str, Any], deep: bool = True) -> Dict[str, Any]:
         """
         Filter sensitive information from a dictionary
         
+        The input is returned as-is when nothing needs filtering; a new
+        dictionary is only built once the first change is found.
+        
         Args:
             data: Dictionary to filter
             deep: Whether to recursively filter nested structures
@@ -38,44 +63,72 @@ class PrivacyFilter:
         if not isinstance(data, dict):
             return data
         
-        filtered = {}
-        
-        for key, value in data.items():
-            # Skip sensitive fields
-            if key.lower() in cls.SENSITIVE_FIELDS:
-                continue
-            
-            # Process nested structures if deep filtering is enabled
-            if deep:
-                if isinstance(value, dict):
-                    filtered[key] = cls.filter_dict(value, deep=True)
-                elif isinstance(value, list):
-                    filtered[key] = cls.filter_list(value)
-                elif isinstance(value, str):
-                    filtered[key] = cls.filter_string(value)
-                else:
-                    filtered[key] = value
-            else:
-                filtered[key] = value
+        if deep:
+            return cls._filter_tree(data)
         
-        return filtered
+        # Shallow: only drop sensitive fields
+        sensitive_fields = cls.SENSITIVE_FIELDS
+        if not any(key.lower() in sensitive_fields for key in data):
+            return data
+        return {key: value for key, value in data.items() if key.lower() not in sensitive_fields}
     
     @classmethod
     def filter_list(cls, data: List[Any]) -> List[Any]:
-        """Filter sensitive information from a list"""
-        filtered = []
-        
-        for item in data:
-            if isinstance(item, dict):
-                filtered.append(cls.filter_dict(item, deep=True))
-            elif isinstance(item, list):
-                filtered.append(cls.filter_list(item))
-            elif isinstance(item, str):
-                filtered.append(cls.filter_string(item))
-            else:
-                filtered.append(item)
+        """Filter sensitive information from a list (returned as-is if unchanged)"""
+        return cls._filter_tree(data)
+    
+    @classmethod
+    def _filter_tree(cls, root: Any) -> Any:
+        """
+        Filter a nested dict/list structure iteratively with an explicit
+        stack, so deeply nested documents can't exhaust the recursion limit.
+        Unchanged containers are returned as the same objects.
+        """
+        sensitive_fields = cls.SENSITIVE_FIELDS
+        stack = [_Frame(root)]
+        child_result = _PENDING
         
-        return filtered
+        while True:
+            frame = stack[-1]
+            
+            # A nested container just finished: record it in its parent
+            if child_result is not _PENDING:
+                frame.record(child_result)
+                child_result = _PENDING
+            
+            descended = False
+            for index, entry in frame.entries:
+                frame.index = index
+                if frame.is_dict:
+                    frame.key, value = entry
+                    # Skip sensitive fields
+                    if frame.key.lower() in sensitive_fields:
+                        frame.value = value
+                        frame.record(_REMOVED)
+                        continue
+                else:
+                    value = entry
+                frame.value = value
+                
+                if isinstance(value, (dict, list)):
+                    stack.append(_Frame(value))
+                    descended = True
+                    break
+                
+                if isinstance(value, str):
+                    filtered = cls.filter_string(value)
+                    # Cached results may be an equal but distinct object
+                    frame.record(value if filtered == value else filtered)
+                else:
+                    frame.record(value)
+            
+            if descended:
+                continue
+            
+            stack.pop()
+            child_result = frame.result()
+            if not stack:
+                return child_result
     
     @classmethod
     def filter_string(cls, text: str) -> str:
@@ -91,19 +144,8 @@ class PrivacyFilter:
         if not text:
             return text
         
-        # Replace emails
-        text = cls.EMAIL_PATTERN.sub('[EMAIL_REMOVED]', text)
-        
-        # Replace phone numbers
-        text = cls.PHONE_PATTERN.sub('[PHONE_REMOVED]', text)
-        
-        # Replace CPF
-        text = cls.CPF_PATTERN.sub('[CPF_REMOVED]', text)
-        
-        # Don't replace all numbers as they might be important data
-        # Only replace potential NUSP in specific contexts
-        
-        return text
+        # Pure function of the text; repeated report sections hit the cache
+        return _filter_string_cached(text)
     
     @classmethod
     def filter_report_data(cls, report_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -189,3 +231,48 @@ class PrivacyFilter:
             return False
         
         return True
+
+
+@lru_cache(maxsize=2048)
+def _filter_string_cached(text: str) -> str:
+    """Replace emails, phone numbers and CPF in a single scan"""
+    replacements = PrivacyFilter.REPLACEMENTS
+    
+    # Don't replace all numbers as they might be important data
+    # Only replace potential NUSP in specific contexts
+    return PrivacyFilter.COMBINED_PATTERN.sub(lambda m: replacements[m.lastgroup], text)
+
+
+class _Frame:
+    """Traversal state of one dict/list in PrivacyFilter._filter_tree"""
+    __slots__ = ('source', 'is_dict', 'entries', 'filtered', 'index', 'key', 'value')
+    
+    def __init__(self, source):
+        self.source = source
+        self.is_dict = isinstance(source, dict)
+        self.entries = enumerate(source.items() if self.is_dict else source)
+        self.filtered = None
+        self.index = 0
+        self.key = None
+        self.value = None
+    
+    def record(self, new_value):
+        """Store the filtered value of the current entry, copying on first change"""
+        if self.filtered is None:
+            if new_value is self.value:
+                return
+            # First change: copy the unchanged entries seen so far
+            if self.is_dict:
+                self.filtered = dict(islice(self.source.items(), self.index))
+            else:
+                self.filtered = self.source[:self.index]
+        
+        if new_value is _REMOVED:
+            return
+        if self.is_dict:
+            self.filtered[self.key] = new_value
+        else:
+            self.filtered.append(new_value)
+    
+    def result(self):
+        return self.source if self.filtered is None else self.filtered
@@ -0,0 +1,56 @@
+"""
+Process-wide cache of the technical terms catalog (termos_tecnicos)
+"""
+from typing import Any, NamedTuple, Optional, Tuple
+import threading
+import time
+import logging
+
+from sqlalchemy.orm import Session
+
+from backend.app.models.models import TermoTecnico, TipoTermoEnum
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the catalog is read from the database again. Terms are
+# written only by the offline scripts (init_database.py, populate_terms.py),
+# so their changes reach running processes within this interval.
+CATALOG_TTL_SECONDS = 300
+
+
+class CatalogTerm(NamedTuple):
+    """Read-only copy of a TermoTecnico row, safe to share across sessions"""
+    id: int
+    termo: str
+    termo_normalizado: str
+    tipo: TipoTermoEnum
+    sinonimos: Optional[Any]
+
+
+_catalog: Optional[Tuple[CatalogTerm, ...]] = None
+_catalog_loaded_at = 0.0
+_catalog_lock = threading.Lock()
+
+
+def get_term_catalog(db: Session) -> Tuple[CatalogTerm, ...]:
+    """
+    Get the cached terms catalog, reloading it with the given session when
+    it is missing or older than CATALOG_TTL_SECONDS.
+    
+    A new tuple is returned after each reload, so callers can key derived
+    caches on the returned object's identity.
+    """
+    global _catalog, _catalog_loaded_at
+    with _catalog_lock:
+        now = time.monotonic()
+        if _catalog is not None and now - _catalog_loaded_at < CATALOG_TTL_SECONDS:
+            return _catalog
+        
+        rows = db.query(
+            TermoTecnico.id, TermoTecnico.termo, TermoTecnico.termo_normalizado,
+            TermoTecnico.tipo, TermoTecnico.sinonimos
+        ).order_by(TermoTecnico.id).all()
+        _catalog = tuple(CatalogTerm(*row) for row in rows)
+        _catalog_loaded_at = now
+        logger.info(f"Loaded {len(_catalog)} technical terms into the catalog cache")
+        return _catalog
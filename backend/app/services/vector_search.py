@@ -1,17 +1,78 @@
 """
 Vector search service for semantic search using embeddings
 """
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
-from sqlalchemy import text
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import Integer, bindparam, func, select, text
 from sqlalchemy.orm import Session
 import logging
 
-from backend.app.models.models import Relatorio, RelatorioEmbedding
+from backend.app.models.models import Relatorio, RelatorioEmbedding, RelatorioTermo, TermoTecnico
 from backend.app.services.privacy_filter import PrivacyFilter
 
 logger = logging.getLogger(__name__)
 
+# Dimension of the stored embeddings (relatorio_embeddings.embedding)
+EMBEDDING_DIM = 1536
+
+# Embedding chunks fetched per requested report before grouping by report
+CANDIDATES_PER_RESULT = 4
+
+# IVFFlat lists scanned per query (see backend/migrate_embedding_indexes.py)
+IVFFLAT_PROBES = 10
+
+
+# SQL conditions for the optional search_similar_reports filters
+FILTER_CONDITIONS = {
+    'year': "r.ano = :year",
+    'course': "r.curso = :course",
+    'period': "r.periodo = :period",
+    'company': "r.empresa_razao_social ILIKE :company",
+}
+
+SET_PROBES_STATEMENT = text("SELECT set_config('ivfflat.probes', :probes, true)")
+
+
+@lru_cache(maxsize=None)
+def similar_reports_statement(filter_keys: Tuple[str, ...] = ()):
+    """
+    Build (once per filter combination) the nearest-neighbour statement.
+    The query vector is bound as a typed halfvec parameter, so the SQL text
+    is constant and SQLAlchemy reuses the compiled statement across calls.
+    """
+    # Nearest chunks first, ordered by the bare distance expression so
+    # the IVFFlat index drives the scan; reports are reduced afterwards
+    join_sql = ""
+    where_sql = ""
+    if filter_keys:
+        join_sql = "JOIN relatorios r ON r.id = e.relatorio_id"
+        where_sql = "AND " + " AND ".join(FILTER_CONDITIONS[key] for key in filter_keys)
+    
+    sql = f"""
+        WITH nn AS (
+            SELECT e.relatorio_id,
+                   e.embedding <-> :query_vector AS distance
+            FROM relatorio_embeddings e
+            {join_sql}
+            WHERE e.embedding IS NOT NULL {where_sql}
+            ORDER BY e.embedding <-> :query_vector
+            LIMIT :candidates
+        )
+        SELECT relatorio_id, MIN(distance) AS distance
+        FROM nn
+        GROUP BY relatorio_id
+        ORDER BY distance
+        LIMIT :limit
+    """
+    
+    return text(sql).bindparams(
+        bindparam("query_vector", type_=HALFVEC(EMBEDDING_DIM)),
+        bindparam("candidates", type_=Integer),
+        bindparam("limit", type_=Integer),
+    )
+
 
 class VectorSearchService:
     """Service for vector-based semantic search"""
@@ -19,7 +80,7 @@ class VectorSearchService:
     @staticmethod
     def search_similar_reports(
         db: Session,
-        query_embedding: List[float],
+        query_embedding: np.ndarray,
         limit: int = 10,
         threshold: float = None,
         filters: Dict[str, Any] = None
@@ -29,7 +90,7 @@ class VectorSearchService:
         
         Args:
             db: Database session
-            query_embedding: Query vector (1536 dimensions)
+            query_embedding: Query vector, float32 array of shape (EMBEDDING_DIM,)
             limit: Maximum number of results
             threshold: Optional similarity threshold
             filters: Optional filters (year, course, etc.)
@@ -37,69 +98,80 @@ class VectorSearchService:
         Returns:
             List of (Report, similarity_score) tuples
         """
+        # No copy when the caller already passes a float32 array
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        if query_embedding.shape != (EMBEDDING_DIM,):
+            raise ValueError(
+                f"query_embedding must have shape ({EMBEDDING_DIM},), got {query_embedding.shape}"
+            )
+        
         try:
-            # Build the base query
-            query_vector_str = '[' + ','.join(map(str, query_embedding)) + ']'
-            
-            # Base SQL with vector similarity
-            sql = """
-                SELECT DISTINCT r.*, 
-                       MIN(e.embedding <-> CAST(:query_vector AS vector)) as distance
-                FROM relatorios r
-                JOIN relatorio_embeddings e ON r.id = e.relatorio_id
-                WHERE e.embedding IS NOT NULL
-            """
-            
-            params = {"query_vector": query_vector_str}
+            params = {
+                "query_vector": query_embedding,
+                "limit": limit,
+                "candidates": limit * CANDIDATES_PER_RESULT,
+            }
             
             # Add filters if provided
-            conditions = []
+            filter_keys = []
             if filters:
                 if 'year' in filters:
-                    conditions.append("r.ano = :year")
+                    filter_keys.append('year')
                     params['year'] = filters['year']
                 
                 if 'course' in filters:
-                    conditions.append("r.curso = :course")
+                    filter_keys.append('course')
                     params['course'] = filters['course']
                 
                 if 'period' in filters:
-                    conditions.append("r.periodo = :period")
+                    filter_keys.append('period')
                     params['period'] = filters['period']
                 
                 if 'company' in filters:
-                    conditions.append("r.empresa_razao_social ILIKE :company")
+                    filter_keys.append('company')
                     params['company'] = f"%{filters['company']}%"
             
-            if conditions:
-                sql += " AND " + " AND ".join(conditions)
+            # Number of IVFFlat lists probed, scoped to the current transaction
+            db.execute(SET_PROBES_STATEMENT, {"probes": str(IVFFLAT_PROBES)})
+            
+            # Execute query
+            result = db.execute(similar_reports_statement(tuple(filter_keys)), params)
             
-            # Group by all columns in relatorios table
-            sql += """
-                GROUP BY r.id
-                ORDER BY distance
-                LIMIT :limit
-            """
+            # (report_id, distance) pairs, already ordered by distance
+            rows = result.fetchall()
+            if not rows:
+                return []
             
-            params['limit'] = limit
+            report_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            distances = np.fromiter((row[-1] for row in rows), dtype=np.float64, count=len(rows))
             
-            # Execute query
-            result = db.execute(text(sql), params)
+            # Convert distance to similarity score (inverse)
+            # Lower distance = higher similarity
+            similarities = 1.0 / (1.0 + distances)
+            
+            # Apply threshold if specified, before loading any report
+            if threshold is not None:
+                keep = similarities >= threshold
+                report_ids = report_ids[keep]
+                similarities = similarities[keep]
+            if report_ids.size == 0:
+                return []
+            
+            report_ids = report_ids.tolist()
+            similarities = similarities.tolist()
+            
+            # Fetch all matching Report objects in a single query
+            reports_by_id = {
+                report.id: report
+                for report in db.query(Relatorio).filter(Relatorio.id.in_(report_ids)).all()
+            }
             
             # Convert results to Report objects with scores
-            reports_with_scores = []
-            for row in result:
-                # Reconstruct the Report object
-                report = db.query(Relatorio).filter_by(id=row[0]).first()
-                if report:
-                    # Convert distance to similarity score (inverse)
-                    # Lower distance = higher similarity
-                    distance = row[-1]  # Last column is distance
-                    similarity = 1.0 / (1.0 + distance)  # Simple conversion
-                    
-                    # Apply threshold if specified
-                    if threshold is None or similarity >= threshold:
-                        reports_with_scores.append((report, similarity))
+            reports_with_scores = [
+                (reports_by_id[report_id], similarity)
+                for report_id, similarity in zip(report_ids, similarities)
+                if report_id in reports_by_id
+            ]
             
             return reports_with_scores
             
@@ -126,39 +198,48 @@ class VectorSearchService:
         """
         context = {}
         
+        # Only the needed JSON sections are extracted in SQL (jsonb -> key),
+        # so the full json_completo document never leaves the database
+        sections = [section] if section else ['sobre_empresa', 'conclusao']
+        section_columns = []
+        for name in sections:
+            section_columns.append(Relatorio.json_completo.has_key(name))
+            section_columns.append(Relatorio.json_completo[name])
+        
+        rows_by_id = {
+            row[0]: row
+            for row in db.query(
+                Relatorio.id, Relatorio.empresa_razao_social, Relatorio.ano,
+                Relatorio.periodo, Relatorio.curso, *section_columns
+            ).filter(Relatorio.id.in_(report_ids))
+        }
+        
         for report_id in report_ids:
-            report = db.query(Relatorio).filter_by(id=report_id).first()
-            if not report:
+            row = rows_by_id.get(report_id)
+            if not row:
                 continue
             
+            _, company, year, period, course = row[:5]
             report_context = {
-                'company': report.empresa_razao_social,
-                'year': report.ano,
-                'period': report.periodo.value if report.periodo else None,
-                'course': report.curso.value if report.curso else None,
+                'company': company,
+                'year': year,
+                'period': period.value if period else None,
+                'course': course.value if course else None,
             }
             
-            # Get specific sections if requested
-            if section:
-                if section in report.json_completo:
-                    # Apply privacy filter
-                    filtered_content = PrivacyFilter.filter_string(
-                        str(report.json_completo.get(section, ''))
-                    )
-                    report_context[section] = filtered_content
-            else:
-                # Get main sections with privacy filtering
-                json_data = report.json_completo
+            # (has_key, value) pairs, in the order of sections
+            section_values = row[5:]
+            for i, name in enumerate(sections):
+                present, value = section_values[2 * i], section_values[2 * i + 1]
+                if not present:
+                    continue
                 
-                if 'sobre_empresa' in json_data:
-                    report_context['sobre_empresa'] = PrivacyFilter.filter_string(
-                        json_data['sobre_empresa']
-                    )[:500]  # Limit length
-                
-                if 'conclusao' in json_data:
-                    report_context['conclusao'] = PrivacyFilter.filter_string(
-                        json_data['conclusao']
-                    )[:500]
+                # Apply privacy filter
+                if section:
+                    report_context[name] = PrivacyFilter.filter_string(str(value))
+                else:
+                    # Main sections, limited in length
+                    report_context[name] = PrivacyFilter.filter_string(value)[:500]
             
             context[report_id] = report_context
         
@@ -182,31 +263,24 @@ class VectorSearchService:
             List of reports containing the terms
         """
         try:
-            # Build query to find reports with these terms
-            sql = """
-                SELECT DISTINCT r.*, COUNT(DISTINCT tt.termo_normalizado) as term_count
-                FROM relatorios r
-                JOIN relatorio_termos rt ON r.id = rt.relatorio_id
-                JOIN termos_tecnicos tt ON tt.id = rt.termo_id
-                WHERE LOWER(tt.termo_normalizado) IN :terms
-                GROUP BY r.id
-                ORDER BY term_count DESC, r.id DESC
-                LIMIT :limit
-            """
-            
             # Normalize terms for comparison
-            normalized_terms = tuple(term.lower() for term in terms)
+            normalized_terms = [term.lower() for term in terms]
             
-            result = db.execute(
-                text(sql),
-                {"terms": normalized_terms, "limit": limit}
+            # Rank and hydrate in one statement, keeping the rank order
+            stmt = (
+                select(Relatorio)
+                .join(RelatorioTermo, RelatorioTermo.relatorio_id == Relatorio.id)
+                .join(TermoTecnico, TermoTecnico.id == RelatorioTermo.termo_id)
+                .where(func.lower(TermoTecnico.termo_normalizado).in_(normalized_terms))
+                .group_by(Relatorio.id)
+                .order_by(
+                    func.count(TermoTecnico.termo_normalizado.distinct()).desc(),
+                    Relatorio.id.desc()
+                )
+                .limit(limit)
             )
             
-            # Get Report objects
-            report_ids = [row[0] for row in result]
-            reports = db.query(Relatorio).filter(Relatorio.id.in_(report_ids)).all()
-            
-            return reports
+            return list(db.scalars(stmt))
             
         except Exception as e:
             logger.error(f"Error finding reports by terms: {e}")
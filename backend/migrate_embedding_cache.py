@@ -0,0 +1,37 @@
+"""
+Migration script to add the embedding_cache table, so embeddings are
+looked up by content hash instead of being generated again
+"""
+from sqlalchemy import text
+from backend.app.db.database import engine
+
+def run_migration():
+    """Run the migration to add the embedding cache table"""
+    
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            hash BYTEA NOT NULL,
+            modelo VARCHAR(50) NOT NULL,
+            embedding HALFVEC(1536) NOT NULL,
+            created_at TIMESTAMP DEFAULT timezone('UTC', now()),
+            PRIMARY KEY (hash, modelo)
+        )
+        """,
+    ]
+    
+    with engine.connect() as conn:
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+                print(f"✅ Executed: {statement[:50]}...")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error executing statement: {e}")
+                print(f"Statement: {statement}")
+    
+    print("🎉 Embedding cache migration completed!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,57 @@
+"""
+Migration script to create the embedding and chat message indexes on
+existing databases, and to (re)build the IVFFlat index on
+relatorio_embeddings.embedding once the embeddings are loaded
+"""
+import math
+
+from sqlalchemy import text
+from backend.app.db.database import engine
+
+# pgvector guidance: rows / 1000 lists up to 1M rows, sqrt(rows) above
+MIN_IVFFLAT_LISTS = 10
+SQRT_LISTS_THRESHOLD = 1_000_000
+
+def ivfflat_lists(row_count: int) -> int:
+    """Number of IVFFlat lists for a table with row_count embeddings"""
+    if row_count > SQRT_LISTS_THRESHOLD:
+        return int(math.sqrt(row_count))
+    return max(row_count // 1000, MIN_IVFFLAT_LISTS)
+
+def run_migration():
+    """Run the migration to create the embedding and chat message indexes"""
+    
+    statements = [
+        "CREATE INDEX IF NOT EXISTS ix_embedding_relatorio_secao ON relatorio_embeddings (relatorio_id, secao)",
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_session ON chat_messages (session_id, created_at)",
+    ]
+    
+    with engine.connect() as conn:
+        row_count = conn.execute(
+            text("SELECT count(*) FROM relatorio_embeddings WHERE embedding IS NOT NULL")
+        ).scalar()
+        if row_count:
+            # IVFFlat computes its lists from the rows present when it is built
+            lists = ivfflat_lists(row_count)
+            statements += [
+                "DROP INDEX IF EXISTS ix_embedding_ivfflat",
+                f"CREATE INDEX ix_embedding_ivfflat ON relatorio_embeddings USING ivfflat (embedding halfvec_l2_ops) WITH (lists = {lists})",
+            ]
+            print(f"📊 {row_count} embeddings, building IVFFlat index with lists = {lists}")
+        else:
+            print("⚠️  No embeddings loaded; run scripts/generate_embeddings.py before building the IVFFlat index")
+        
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+                print(f"✅ Executed: {statement[:50]}...")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error executing statement: {e}")
+                print(f"Statement: {statement}")
+    
+    print("🎉 Embedding indexes migration completed!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,31 @@
+"""
+Migration script to store relatorio_embeddings.embedding as halfvec (FP16).
+The ANN index is dropped; rebuild it with backend/migrate_embedding_indexes.py
+"""
+from sqlalchemy import text
+from backend.app.db.database import engine
+
+def run_migration():
+    """Run the migration to convert embeddings to halfvec"""
+    
+    statements = [
+        "DROP INDEX IF EXISTS ix_embedding_ivfflat",
+        "ALTER TABLE relatorio_embeddings ALTER COLUMN embedding TYPE halfvec(1536) USING embedding::halfvec(1536)",
+    ]
+    
+    with engine.connect() as conn:
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+                print(f"✅ Executed: {statement[:50]}...")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error executing statement: {e}")
+                print(f"Statement: {statement}")
+    
+    print("🎉 halfvec migration completed!")
+    print("Run python -m backend.migrate_embedding_indexes to rebuild the IVFFlat index")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,30 @@
+"""
+Migration script to add a trigram GIN index on relatorios.empresa_razao_social
+so ILIKE '%company%' filters can use an index
+"""
+from sqlalchemy import text
+from backend.app.db.database import engine
+
+def run_migration():
+    """Run the migration to index company names with pg_trgm"""
+    
+    statements = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_relatorios_empresa_trgm ON relatorios USING gin (empresa_razao_social gin_trgm_ops)",
+    ]
+    
+    with engine.connect() as conn:
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+                print(f"✅ Executed: {statement[:50]}...")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error executing statement: {e}")
+                print(f"Statement: {statement}")
+    
+    print("🎉 Company trigram index migration completed!")
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,29 @@
+"""
+Migration script to add a partial index on unused magic tokens,
+so valid/expired token queries don't scan the whole table
+"""
+from sqlalchemy import text
+from backend.app.db.database import engine
+
+def run_migration():
+    """Run the migration to add the active magic token index"""
+    
+    statements = [
+        "CREATE INDEX IF NOT EXISTS ix_magic_tokens_active ON magic_tokens (expires_at) WHERE used_at IS NULL",
+    ]
+    
+    with engine.connect() as conn:
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+                print(f"✅ Executed: {statement[:50]}...")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error executing statement: {e}")
+                print(f"Statement: {statement}")
+    
+    print("🎉 Active magic token index migration completed!")
+
+if __name__ == "__main__":
+    run_migration()
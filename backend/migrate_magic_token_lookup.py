@@ -0,0 +1,32 @@
+"""
+Migration script to drop the redundant indexes on magic_tokens.token;
+token lookups use the index of its UNIQUE constraint
+"""
+from sqlalchemy import text
+from backend.app.db.database import engine
+
+def run_migration():
+    """Run the migration to drop the redundant magic token lookup indexes"""
+    
+    statements = [
+        # Verifications read whole MagicToken and User rows, so the INCLUDE
+        # columns never allowed an index-only scan
+        "DROP INDEX IF EXISTS ix_magic_tokens_lookup",
+        "DROP INDEX IF EXISTS idx_magic_tokens_token",
+    ]
+    
+    with engine.connect() as conn:
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+                print(f"✅ Executed: {statement[:50]}...")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error executing statement: {e}")
+                print(f"Statement: {statement}")
+    
+    print("🎉 Magic token lookup index cleanup completed!")
+
+if __name__ == "__main__":
+    run_migration()
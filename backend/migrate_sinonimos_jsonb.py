@@ -0,0 +1,30 @@
+"""
+Migration script to convert termos_tecnicos.sinonimos from JSON to JSONB
+and index it for containment (@>) queries
+"""
+from sqlalchemy import text
+from backend.app.db.database import engine
+
+def run_migration():
+    """Run the migration to switch sinonimos to JSONB"""
+    
+    statements = [
+        "ALTER TABLE termos_tecnicos ALTER COLUMN sinonimos TYPE jsonb USING sinonimos::jsonb",
+        "CREATE INDEX IF NOT EXISTS ix_termos_sinonimos_gin ON termos_tecnicos USING gin (sinonimos)",
+    ]
+    
+    with engine.connect() as conn:
+        for statement in statements:
+            try:
+                conn.execute(text(statement))
+                conn.commit()
+                print(f"✅ Executed: {statement[:50]}...")
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error executing statement: {e}")
+                print(f"Statement: {statement}")
+    
+    print("🎉 sinonimos JSONB migration completed!")
+
+if __name__ == "__main__":
+    run_migration()
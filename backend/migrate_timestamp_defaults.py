@@ -0,0 +1,39 @@
+"""
+Migration script to move created_at/updated_at defaults to the database
+(server_default) for tables whose models no longer set them in Python
+"""
+from sqlalchemy import text
+from backend.app.db.database import engine
+
+TIMESTAMP_COLUMNS = {
+    'relatorios': ['created_at', 'updated_at'],
+    'relatorio_embeddings': ['created_at'],
+    'termos_tecnicos': ['created_at'],
+    'relatorio_termos': ['created_at'],
+    'chat_sessions': ['created_at', 'updated_at'],
+    'chat_messages': ['created_at'],
+}
+
+def run_migration():
+    """Run the migration to set server-side timestamp defaults"""
+    
+    with engine.connect() as conn:
+        for table, columns in TIMESTAMP_COLUMNS.items():
+            for column in columns:
+                statement = (
+                    f"ALTER TABLE {table} ALTER COLUMN {column} "
+                    f"SET DEFAULT timezone('UTC', now())"
+                )
+                try:
+                    conn.execute(text(statement))
+                    conn.commit()
+                    print(f"✅ Executed: {statement[:60]}...")
+                except Exception as e:
+                    conn.rollback()
+                    print(f"❌ Error executing statement: {e}")
+                    print(f"Statement: {statement}")
+    
+    print("🎉 Timestamp defaults migration completed!")
+
+if __name__ == "__main__":
+    run_migration()
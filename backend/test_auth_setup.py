@@ -3,12 +3,6 @@
 Test script to validate authentication system setup
 """
 import sys
-import os
-
-# Add the parent directory to sys.path for module resolution
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
 
 try:
     # Test imports
@@ -20,7 +14,7 @@ try:
     from backend.app.core.dependencies import get_current_user
     print("✅ Dependencies imports OK")
     
-    from backend.app.services.email_service import email_service
+    from backend.app.services.email_service import get_email_service
     print("✅ Email service imports OK")
     
     from backend.app.api.auth import router
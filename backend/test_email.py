@@ -2,16 +2,9 @@
 """
 Test email sending with current configuration
 """
-import sys
-import os
 import asyncio
 
-# Add the parent directory to sys.path for module resolution
-current_dir = os.path.dirname(os.path.abspath(__file__))
-parent_dir = os.path.dirname(current_dir)
-sys.path.insert(0, parent_dir)
-
-from backend.app.services.email_service import email_service
+from backend.app.services.email_service import get_email_service
 from backend.app.core.config import settings
 
 
@@ -46,7 +39,7 @@ async def test_email_sending():
     
     try:
         # Send test email
-        success = await email_service.send_magic_link(
+        success = await get_email_service().send_magic_link(
             to_email=test_email,
             magic_token=test_token,
             full_name="Usuário Teste"
@@ -2,15 +2,10 @@
 Quick test to generate a fresh magic token for testing verification
 """
 import asyncio
-import sys
-import os
 from datetime import datetime, timedelta
 
-# Add the backend directory to Python path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
-from app.core.auth import create_magic_token
-from app.core.config import settings
+from backend.app.core.auth import create_magic_token
+from backend.app.core.config import settings
 
 async def generate_test_token():
     """Generate a test magic token"""
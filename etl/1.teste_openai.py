@@ -1,10 +1,16 @@
 import os
-import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import orjson
 import pdfplumber
-from openai import OpenAI
+import pypdfium2 as pdfium
+from openai import AsyncOpenAI
 
-# Inicializar cliente OpenAI
-client = OpenAI(api_key="SUA_API_KEY_AQUI")
+# Inicializar cliente OpenAI (um único cliente reaproveita as conexões HTTP)
+client = AsyncOpenAI(api_key="SUA_API_KEY_AQUI")
+
+# Número máximo de chamadas simultâneas à API
+MAX_REQUISICOES_SIMULTANEAS = 10
 
 # Caminhos
 PASTA_PDFS = "/home/m/pcs/conversa-estagios-v2/arquivos/relatorios_pdf"
@@ -77,40 +83,76 @@ Agora processe os documentos fornecidos (template e relatório preenchido) e dev
 """
 
 
+def extrair_texto_pdfium(caminho_pdf):
+    # Extrator nativo do PDFium: sem a análise de layout do pdfplumber
+    pdf = pdfium.PdfDocument(caminho_pdf)
+    try:
+        partes = []
+        for indice in range(len(pdf)):
+            pagina = pdf[indice]
+            pagina_texto = pagina.get_textpage()
+            partes.append(pagina_texto.get_text_range())
+            pagina_texto.close()
+            pagina.close()
+    finally:
+        pdf.close()
+    return "\n".join(partes).replace("\r\n", "\n").strip()
+
+
 def extrair_texto_pdf(caminho_pdf):
-    texto = ""
+    texto = extrair_texto_pdfium(caminho_pdf)
+    if texto:
+        return texto
+
+    # Sem texto pelo PDFium: tenta a extração com layout do pdfplumber
+    partes = []
     with pdfplumber.open(caminho_pdf) as pdf:
         for pagina in pdf.pages:
-            texto += pagina.extract_text() + "\n"
-    return texto
+            texto_pagina = pagina.extract_text()
+            if texto_pagina:
+                partes.append(texto_pagina)
+    return "\n".join(partes)
 
 
-def processar_relatorio(pdf_path):
-    # Extrair texto do PDF
-    conteudo_pdf = extrair_texto_pdf(pdf_path)
+def extrair_texto_pdf_seguro(caminho_pdf):
+    # Um PDF corrompido não deve interromper o lote: a exceção volta no lugar do texto
+    try:
+        return extrair_texto_pdf(caminho_pdf)
+    except Exception as erro:
+        return erro
 
-    # Criar prompt final
-    prompt = (
-        f"{PROMPT_BASE}\n\nTemplate:\n{template_texto}\n\nRelatório:\n{conteudo_pdf}"
-    )
 
-    # Enviar para a API
-    resposta = client.chat.completions.create(
-        model="gpt-4.1",  # você pode trocar para gpt-4o-mini para reduzir custo
-        messages=[
-            {
-                "role": "system",
-                "content": "Você é um assistente especializado em extração de informações de documentos acadêmicos.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0,
-    )
+# Prefixo fixo das mensagens, montado uma única vez: instruções e template
+# ficam antes do relatório para aproveitar o cache de prefixo da OpenAI
+MENSAGENS_FIXAS = [
+    {
+        "role": "system",
+        "content": "Você é um assistente especializado em extração de informações de documentos acadêmicos.",
+    },
+    {
+        "role": "system",
+        "content": f"{PROMPT_BASE}\n\nTemplate:\n{template_texto}",
+    },
+]
+
+
+async def processar_relatorio(pdf_path, conteudo_pdf, semaforo):
+    # Enviar para a API (apenas a última mensagem muda entre relatórios)
+    async with semaforo:
+        resposta = await client.chat.completions.create(
+            model="gpt-4.1",  # você pode trocar para gpt-4o-mini para reduzir custo
+            messages=MENSAGENS_FIXAS + [
+                {"role": "user", "content": f"Relatório:\n{conteudo_pdf}"},
+            ],
+            temperature=0,
+            # Modo JSON: a resposta é sempre um objeto JSON válido
+            response_format={"type": "json_object"},
+        )
 
     # Pegar o JSON retornado
     try:
-        dados = json.loads(resposta.choices[0].message.content)
-    except json.JSONDecodeError:
+        dados = orjson.loads(resposta.choices[0].message.content)
+    except orjson.JSONDecodeError:
         print(
             f"⚠ Erro ao interpretar JSON no arquivo {pdf_path}. Salvando como texto bruto."
         )
@@ -119,23 +161,56 @@ def processar_relatorio(pdf_path):
     return dados
 
 
-def main():
-    for arquivo in os.listdir(PASTA_PDFS):
-        if arquivo.endswith(".pdf"):
-            caminho_pdf = os.path.join(PASTA_PDFS, arquivo)
-            print(f"🔎 Processando {arquivo}...")
-
-            resultado = processar_relatorio(caminho_pdf)
-
-            # Nome de saída
-            nome_saida = os.path.splitext(arquivo)[0] + ".json"
-            caminho_saida = os.path.join(PASTA_SAIDA, nome_saida)
+async def processar_lote(caminhos, textos):
+    # Chamadas concorrentes; exceções voltam no lugar do resultado
+    semaforo = asyncio.Semaphore(MAX_REQUISICOES_SIMULTANEAS)
+    return await asyncio.gather(
+        *(
+            processar_relatorio(caminho, texto, semaforo)
+            for caminho, texto in zip(caminhos, textos)
+        ),
+        return_exceptions=True,
+    )
 
-            # Salvar JSON
-            with open(caminho_saida, "w", encoding="utf-8") as f:
-                json.dump(resultado, f, ensure_ascii=False, indent=2)
 
-            print(f"✅ Resultado salvo em {caminho_saida}")
+def main():
+    arquivos = [a for a in os.listdir(PASTA_PDFS) if a.endswith(".pdf")]
+    caminhos = [os.path.join(PASTA_PDFS, arquivo) for arquivo in arquivos]
+
+    # Extrair o texto de todos os PDFs em paralelo (parsing limitado por CPU)
+    print(f"🔎 Extraindo texto de {len(arquivos)} PDFs...")
+    with ProcessPoolExecutor() as executor:
+        extraidos = list(executor.map(extrair_texto_pdf_seguro, caminhos))
+
+    # PDFs com erro de extração são ignorados, como os erros da API
+    arquivos_validos, caminhos_validos, textos = [], [], []
+    for arquivo, caminho, texto in zip(arquivos, caminhos, extraidos):
+        if isinstance(texto, Exception):
+            print(f"❌ Erro ao extrair texto de {arquivo}: {texto}")
+            continue
+        arquivos_validos.append(arquivo)
+        caminhos_validos.append(caminho)
+        textos.append(texto)
+    arquivos, caminhos = arquivos_validos, caminhos_validos
+
+    # Enviar os relatórios para a API de forma concorrente
+    print(f"🔎 Processando {len(arquivos)} relatórios...")
+    resultados = asyncio.run(processar_lote(caminhos, textos))
+
+    for arquivo, resultado in zip(arquivos, resultados):
+        if isinstance(resultado, Exception):
+            print(f"❌ Erro ao processar {arquivo}: {resultado}")
+            continue
+
+        # Nome de saída
+        nome_saida = os.path.splitext(arquivo)[0] + ".json"
+        caminho_saida = os.path.join(PASTA_SAIDA, nome_saida)
+
+        # Salvar JSON (orjson grava UTF-8 direto, sem escapar acentos)
+        with open(caminho_saida, "wb") as f:
+            f.write(orjson.dumps(resultado, option=orjson.OPT_INDENT_2))
+
+        print(f"✅ Resultado salvo em {caminho_saida}")
 
 
 if __name__ == "__main__":
@@ -5,18 +5,25 @@ Usa pdfplumber para extração de texto e API da Anthropic para processamento
 """
 
 import argparse
-import json
+import asyncio
+import base64
+import logging
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import orjson
 import pdfplumber
+import pypdfium2 as pdfium
 import anthropic
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Prompt para extração de informações
 EXTRACTION_PROMPT = """
 # Prompt para Extração de Informações de Relatórios de Estágio
@@ -162,6 +169,74 @@ Agora, analise o TEXTO do relatório de estágio fornecido abaixo e retorne apen
 
 """
 
+# Bloco de conteúdo fixo com o prompt, marcado para prompt caching
+EXTRACTION_PROMPT_BLOCK = {
+    "type": "text",
+    "text": EXTRACTION_PROMPT,
+    "cache_control": {"type": "ephemeral"},
+}
+
+# Início da resposta do assistente, garante que a saída seja apenas o JSON
+JSON_PREFILL = "{"
+
+# Número máximo de chamadas simultâneas à API no modo batch
+MAX_CONCURRENT_REQUESTS = 8
+
+# Acima deste número de caracteres de texto extraído, process_pdf envia o
+# próprio PDF para a API em vez do texto
+LONG_TEXT_THRESHOLD = 30000
+
+
+def _extract_text_pdfium(pdf_path: str) -> str:
+    """
+    Extrai o texto com o extrator nativo do PDFium (pypdfium2), sem a
+    reconstrução de layout do pdfplumber; os relatórios já vêm em ordem de leitura
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        parts = []
+        for index in range(len(pdf)):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            parts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+    return "\n".join(parts).replace("\r\n", "\n").strip()
+
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """
+    Extrai texto de um arquivo PDF
+
+    Usa o PDFium e só recorre ao pdfplumber (análise de layout, bem mais
+    lenta) quando nenhum texto é encontrado.
+
+    Função de módulo (e não método) para poder ser usada em um
+    ProcessPoolExecutor, já que o parsing do PDF é limitado por CPU.
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+
+    Returns:
+        Texto extraído do PDF
+    """
+    try:
+        text = _extract_text_pdfium(pdf_path)
+        if text:
+            return text
+
+        with pdfplumber.open(pdf_path) as pdf:
+            parts = []
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    parts.append(page_text)
+            return "\n".join(parts).strip()
+    except Exception as e:
+        raise Exception(f"Erro ao extrair texto do PDF: {str(e)}")
+
 
 class RelatorioExtractor:
     """Classe para extração de informações de relatórios de estágio"""
@@ -173,9 +248,9 @@ class RelatorioExtractor:
         Args:
             api_key: Chave da API da Anthropic. Se None, será lida da variável ANTHROPIC_API_KEY
         """
-        print("DEBUG: Inicializando RelatorioExtractor...")
+        logger.debug("Inicializando RelatorioExtractor...")
         if api_key:
-            print("DEBUG: Usando API key fornecida via parâmetro")
+            logger.debug("Usando API key fornecida via parâmetro")
             self.client = anthropic.Anthropic(api_key=api_key)
         else:
             # Tenta ler da variável de ambiente
@@ -186,7 +261,9 @@ class RelatorioExtractor:
                     "API key da Anthropic não fornecida. Use o parâmetro api_key ou defina ANTHROPIC_API_KEY"
                 )
             self.client = anthropic.Anthropic(api_key=api_key)
-        print("DEBUG: Cliente Anthropic inicializado com sucesso")
+        # Cliente assíncrono para o processamento em lote
+        self.async_client = anthropic.AsyncAnthropic(api_key=api_key)
+        logger.debug("Cliente Anthropic inicializado com sucesso")
 
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """
@@ -198,16 +275,70 @@ class RelatorioExtractor:
         Returns:
             Texto extraído do PDF
         """
+        return extract_text_from_pdf(pdf_path)
+
+    def _build_prompt(self, texto_relatorio: str) -> List[Dict[str, Any]]:
+        """
+        Monta o conteúdo da mensagem para um relatório
+
+        O prompt fixo vai em um bloco próprio marcado com cache_control, para
+        que a API reutilize esse prefixo entre relatórios; só o texto do
+        relatório muda de uma chamada para outra.
+        """
+        logger.debug("Texto do relatório tem %d caracteres", len(texto_relatorio))
+
+        return [
+            EXTRACTION_PROMPT_BLOCK,
+            {"type": "text", "text": f"**TEXTO DO RELATÓRIO:**\n{texto_relatorio}"},
+        ]
+
+    def _message_params(self, conteudo: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Parâmetros da chamada à API (iguais nos modos síncrono e assíncrono)"""
+        return {
+            # "model": "claude-3-7-sonnet-latest",
+            "model": "claude-3-5-haiku-latest",
+            "max_tokens": 8000,
+            "messages": [
+                {"role": "user", "content": conteudo},
+                # Pré-preenche a resposta para que ela seja só o objeto JSON
+                {"role": "assistant", "content": JSON_PREFILL},
+            ],
+        }
+
+    def _join_stream(self, partes: List[str], stop_reason: Optional[str]) -> str:
+        """
+        Junta as partes de texto recebidas no streaming
+
+        Uma resposta interrompida por max_tokens é um JSON incompleto, então
+        o erro é reportado direto, sem tentar o parse.
+        """
+        if stop_reason == "max_tokens":
+            raise ValueError(
+                "Resposta truncada: o limite de max_tokens foi atingido antes do fim do JSON"
+            )
+        return "".join(partes)
+
+    def _parse_response(self, response_text: str) -> Dict[str, Any]:
+        """
+        Faz o parse do JSON retornado pela API
+
+        A resposta é forçada a começar pelo objeto JSON (a mensagem do
+        assistente é pré-preenchida com "{"), então basta um único orjson.loads.
+
+        Args:
+            response_text: Texto da resposta da API (continuação após o "{")
+
+        Returns:
+            Dicionário com informações estruturadas
+        """
+        logger.debug("Resposta da API tem %d caracteres", len(response_text))
+
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                return text.strip()
-        except Exception as e:
-            raise Exception(f"Erro ao extrair texto do PDF: {str(e)}")
+            return orjson.loads(JSON_PREFILL + response_text)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(
+                f"Não foi possível fazer parse do JSON ({e}). Resposta: {response_text[:500]}..."
+            )
 
     def extract_info_from_text(self, texto_relatorio: str) -> Dict[str, Any]:
         """
@@ -220,82 +351,138 @@ class RelatorioExtractor:
             Dicionário com informações estruturadas
         """
 
+        # Monta o prompt completo
+        return self._extract(self._build_prompt(texto_relatorio))
+
+    def extract_info_from_document(self, pdf_path: str) -> Dict[str, Any]:
+        """
+        Extrai informações estruturadas enviando o próprio PDF para a API
+        (bloco "document"), em vez do texto extraído
+
+        Args:
+            pdf_path: Caminho para o arquivo PDF
+
+        Returns:
+            Dicionário com informações estruturadas
+        """
+        with open(pdf_path, "rb") as f:
+            dados_pdf = base64.standard_b64encode(f.read()).decode("ascii")
+
+        return self._extract([
+            EXTRACTION_PROMPT_BLOCK,
+            {
+                "type": "document",
+                "source": {
+                    "type": "base64",
+                    "media_type": "application/pdf",
+                    "data": dados_pdf,
+                },
+                # Reenvios do mesmo PDF (ex.: durante testes) reaproveitam o cache
+                "cache_control": {"type": "ephemeral"},
+            },
+        ])
+
+    def _extract(self, conteudo: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Chama a API com o conteúdo da mensagem e faz o parse da resposta"""
         try:
-            # Monta o prompt completo
-            print(f"DEBUG: Texto do relatório tem {len(texto_relatorio)} caracteres")
+            logger.debug("Preparando chamada da API...")
 
-            # prompt_completo = EXTRACTION_PROMPT.format(texto_relatorio=texto_relatorio)
-            prompt_completo = (
-                f"{EXTRACTION_PROMPT}\n\n**TEXTO DO RELATÓRIO:**\n{texto_relatorio}"
-            )
+            # Chama a API da Anthropic em modo streaming: a resposta chega em
+            # partes enquanto é gerada, sem risco de timeout em saídas longas
+            with self.client.messages.stream(**self._message_params(conteudo)) as stream:
+                partes = list(stream.text_stream)
+                stop_reason = stream.get_final_message().stop_reason
+            logger.debug("Chamada da API bem-sucedida")
 
-            print(f"DEBUG: Prompt completo tem {len(prompt_completo)} caracteres")
+            # Extrai a resposta
+            return self._parse_response(self._join_stream(partes, stop_reason))
+        except Exception as e:
+            logger.debug("Erro inesperado na extração de informações: %s", e)
+            raise
 
-            print("DEBUG: Preparando chamada da API...")
+    async def extract_info_from_text_async(
+        self, texto_relatorio: str, semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        """
+        Versão assíncrona de extract_info_from_text, com o número de
+        chamadas simultâneas limitado pelo semáforo
 
-            try:
-                # Chama a API da Anthropic
-                message = self.client.messages.create(
-                    # model="claude-3-7-sonnet-latest",
-                    model="claude-3-5-haiku-latest",
-                    max_tokens=8000,
-                    messages=[{"role": "user", "content": prompt_completo}],
-                )
-                print(f"DEBUG: Chamada da API bem-sucedida")
+        Args:
+            texto_relatorio: Texto do relatório extraído do PDF
+            semaphore: Semáforo compartilhado entre as chamadas do lote
+
+        Returns:
+            Dicionário com informações estruturadas
+        """
+        conteudo = self._build_prompt(texto_relatorio)
+
+        async with semaphore:
+            async with self.async_client.messages.stream(
+                **self._message_params(conteudo)
+            ) as stream:
+                partes = [texto async for texto in stream.text_stream]
+                stop_reason = (await stream.get_final_message()).stop_reason
+
+        return self._parse_response(self._join_stream(partes, stop_reason))
+
+    async def _extract_batch_async(
+        self, textos: List[Tuple[Path, str]], max_concurrency: int
+    ) -> List[Any]:
+        """Chama a API para todos os textos do lote de forma concorrente"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        tasks = [
+            self.extract_info_from_text_async(texto, semaphore)
+            for _, texto in textos
+        ]
+        # Exceções são retornadas no lugar do resultado para não abortar o lote
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def process_batch(
+        self,
+        pdf_files: List[Path],
+        max_workers: Optional[int] = None,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+    ) -> List[Tuple[Path, Any]]:
+        """
+        Processa vários PDFs em duas etapas: extração de texto em paralelo
+        (processos, limitada por CPU) e chamadas à API concorrentes (asyncio,
+        limitadas por I/O)
 
-                # Extrai a resposta
-                response_text = message.content[0].text
-                print(f"DEBUG: Resposta da API tem {len(response_text)} caracteres")
+        Args:
+            pdf_files: Arquivos PDF a processar
+            max_workers: Número de processos para a extração (padrão: os.cpu_count())
+            max_concurrency: Número máximo de chamadas simultâneas à API
 
-                # Tenta fazer parse do JSON
+        Returns:
+            Lista de (caminho do PDF, informações extraídas ou exceção)
+        """
+        resultados: List[Tuple[Path, Any]] = []
+        textos: List[Tuple[Path, str]] = []
+
+        # Etapa 1: extração de texto em paralelo
+        print(f"Extraindo texto de {len(pdf_files)} PDFs...")
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            futures = [
+                (pdf_path, executor.submit(extract_text_from_pdf, str(pdf_path)))
+                for pdf_path in pdf_files
+            ]
+            for pdf_path, future in futures:
                 try:
-                    return json.loads(response_text.strip())
-                except json.JSONDecodeError as e:
-                    print(f"DEBUG: Erro no parse direto: {e}")
-                    print(f"DEBUG: Tentando extrair JSON da resposta...")
-
-                    # Tenta extrair JSON entre chaves
-                    start_idx = response_text.find("{")
-                    end_idx = response_text.rfind("}") + 1
-
-                    if start_idx != -1 and end_idx > start_idx:
-                        json_str = response_text[start_idx:end_idx]
-                        print(f"DEBUG: JSON extraído tem {len(json_str)} caracteres")
-
-                        try:
-                            return json.loads(json_str)
-                        except json.JSONDecodeError as e2:
-                            print(f"DEBUG: Erro no parse do JSON extraído: {e2}")
-                            # Tenta encontrar um JSON válido dentro da string
-                            import re
-
-                            json_match = re.search(r"\{.*\}", json_str, re.DOTALL)
-                            if json_match:
-                                try:
-                                    return json.loads(json_match.group())
-                                except json.JSONDecodeError as e3:
-                                    print(
-                                        f"DEBUG: Erro no parse do JSON com regex: {e3}"
-                                    )
-                                    raise ValueError(
-                                        f"Não foi possível fazer parse do JSON. Resposta: {response_text[:500]}..."
-                                    )
-                            else:
-                                raise ValueError(
-                                    f"Não foi possível fazer parse do JSON. Resposta: {response_text[:500]}..."
-                                )
-                    else:
-                        raise ValueError(
-                            f"Não foi possível fazer parse do JSON. Resposta: {response_text[:500]}..."
-                        )
-            except Exception as e:
-                print(
-                    f"DEBUG: Erro inesperado na extração de informações: {repr(str(e))}"
-                )
-                raise
-        except Exception as e:
-            print(f"DEBUG: Erro inesperado na extração de informações: {e}")
-            raise
+                    texto = future.result()
+                    if not texto.strip():
+                        raise ValueError("Nenhum texto foi extraído do PDF")
+                    textos.append((pdf_path, texto))
+                except Exception as e:
+                    resultados.append((pdf_path, e))
+
+        # Etapa 2: chamadas à API concorrentes
+        print(f"Processando {len(textos)} textos com a API da Anthropic...")
+        informacoes = asyncio.run(self._extract_batch_async(textos, max_concurrency))
+        resultados.extend(
+            (pdf_path, info) for (pdf_path, _), info in zip(textos, informacoes)
+        )
+
+        return resultados
 
     def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
         """
@@ -317,8 +504,14 @@ class RelatorioExtractor:
         if not texto.strip():
             raise ValueError("Nenhum texto foi extraído do PDF")
 
-        print("Processando texto com a API da Anthropic...")
-        informacoes = self.extract_info_from_text(texto)
+        if len(texto) > LONG_TEXT_THRESHOLD:
+            # Relatório longo: o PDF enviado como documento sai mais barato
+            # e mais rápido que o texto extraído no prompt
+            print("Relatório longo, enviando o PDF para a API da Anthropic...")
+            informacoes = self.extract_info_from_document(pdf_path)
+        else:
+            print("Processando texto com a API da Anthropic...")
+            informacoes = self.extract_info_from_text(texto)
 
         print("✅ Processamento concluído com sucesso!")
         return informacoes
@@ -350,11 +543,22 @@ def main():
     parser.add_argument(
         "--pretty", action="store_true", help="Formata o JSON de saída de forma legível"
     )
+    parser.add_argument(
+        "--debug", action="store_true", help="Exibe mensagens de depuração"
+    )
 
     args = parser.parse_args()
 
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.WARNING,
+        format="%(levelname)s: %(message)s",
+    )
+
     extractor = RelatorioExtractor(api_key=args.api_key)
 
+    # orjson gera UTF-8 direto (equivalente a ensure_ascii=False)
+    opcoes_json = orjson.OPT_INDENT_2 if args.pretty else 0
+
     if args.batch_dir and args.json_dir:
         # Modo batch: processa todos os PDFs da pasta
         batch_dir = Path(args.batch_dir)
@@ -364,15 +568,13 @@ def main():
         if not pdf_files:
             print(f"Nenhum PDF encontrado em {batch_dir}")
             return
-        for pdf_path in pdf_files:
+        for pdf_path, resultado in extractor.process_batch(pdf_files):
             try:
-                resultado = extractor.process_pdf(str(pdf_path))
-                if args.pretty:
-                    json_output = json.dumps(resultado, ensure_ascii=False, indent=2)
-                else:
-                    json_output = json.dumps(resultado, ensure_ascii=False)
+                if isinstance(resultado, Exception):
+                    raise resultado
+                json_output = orjson.dumps(resultado, option=opcoes_json)
                 out_path = json_dir / (pdf_path.stem + ".json")
-                with open(out_path, "w", encoding="utf-8") as f:
+                with open(out_path, "wb") as f:
                     f.write(json_output)
                 print(f"[OK] {pdf_path.name} -> {out_path.name}")
             except Exception as e:
@@ -381,15 +583,12 @@ def main():
         # Modo único
         try:
             resultado = extractor.process_pdf(args.pdf_path)
-            if args.pretty:
-                json_output = json.dumps(resultado, ensure_ascii=False, indent=2)
-            else:
-                json_output = json.dumps(resultado, ensure_ascii=False)
+            json_output = orjson.dumps(resultado, option=opcoes_json)
             if args.output:
                 out_path = Path(args.output)
             else:
                 out_path = Path(args.pdf_path).with_suffix(".json")
-            with open(out_path, "w", encoding="utf-8") as f:
+            with open(out_path, "wb") as f:
                 f.write(json_output)
             print(f"Resultado salvo em: {out_path}")
         except Exception as e:
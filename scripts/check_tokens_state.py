@@ -11,6 +11,7 @@ sys.path.append(project_root)
 from backend.app.db.database import get_db
 from backend.app.models.models import MagicToken, User
 from datetime import datetime
+from sqlalchemy import func
 
 def check_magic_tokens_state():
     print("🔍 Verificando estado atual dos magic tokens...")
@@ -18,18 +19,21 @@ def check_magic_tokens_state():
     db = next(get_db())
     
     try:
-        # Buscar todos os tokens
-        tokens = db.query(MagicToken).all()
+        # Buscar todos os tokens com o email do usuário em uma única consulta
+        rows = db.query(MagicToken, User.email).outerjoin(
+            User, User.id == MagicToken.user_id
+        ).all()
+        tokens = [token for token, _ in rows]
+        emails = {token.id: email or "Unknown" for token, email in rows}
+        
+        # Calcular tempos relativos
+        now_utc = datetime.utcnow()
         
         print(f"📊 Total de tokens na tabela: {len(tokens)}")
         print()
         
         for token in tokens:
-            user = db.query(User).filter(User.id == token.user_id).first()
-            user_email = user.email if user else "Unknown"
-            
-            # Calcular tempos relativos
-            now_utc = datetime.utcnow()
+            user_email = emails[token.id]
             
             print(f"🎫 Token ID: {token.id}")
             print(f"   👤 Usuário: {user_email} (id: {token.user_id})")
@@ -54,21 +58,26 @@ def check_magic_tokens_state():
             
             print()
         
-        # Verificar se há tokens problemáticos
-        used_tokens = [t for t in tokens if t.used_at is not None]
-        expired_tokens = [t for t in tokens if t.expires_at <= now_utc and t.used_at is None]
-        valid_tokens = [t for t in tokens if t.expires_at > now_utc and t.used_at is None]
+        # Contagens por estado; os tokens não usados são contados em uma
+        # consulta própria, que o índice parcial ix_magic_tokens_active atende
+        used_count = db.query(func.count()).filter(MagicToken.used_at.is_not(None)).scalar()
+        expired_count, valid_count = db.query(
+            func.count().filter(MagicToken.expires_at <= now_utc),
+            func.count().filter(MagicToken.expires_at > now_utc),
+        ).filter(MagicToken.used_at.is_(None)).one()
         
         print(f"📈 RESUMO:")
-        print(f"   Tokens usados: {len(used_tokens)}")
-        print(f"   Tokens expirados: {len(expired_tokens)}")
-        print(f"   Tokens válidos: {len(valid_tokens)}")
+        print(f"   Tokens usados: {used_count}")
+        print(f"   Tokens expirados: {expired_count}")
+        print(f"   Tokens válidos: {valid_count}")
+        
+        # Verificar se há tokens problemáticos
+        used_tokens = [t for t in tokens if t.used_at is not None]
         
         if used_tokens:
             print(f"\n🚨 TOKENS QUE DEVERIAM TER SIDO RESETADOS:")
             for token in used_tokens:
-                user = db.query(User).filter(User.id == token.user_id).first()
-                print(f"   - ID {token.id} (user: {user.email if user else 'Unknown'})")
+                print(f"   - ID {token.id} (user: {emails[token.id]})")
                 print(f"     Usado em: {token.used_at}")
                 print(f"     Criado em: {token.created_at}")
         
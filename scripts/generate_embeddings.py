@@ -5,19 +5,31 @@ Generate embeddings for report sections using OpenAI API
 import sys
 import os
 import json
-from typing import List, Dict, Optional
-import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Set, Tuple
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func, select
 from sqlalchemy.orm import sessionmaker
 from backend.app.models.models import Relatorio, RelatorioEmbedding
 from backend.app.core.config import settings
+from backend.app.db.database import (
+    bulk_insert_embeddings, fetch_cached_embeddings, store_cached_embeddings
+)
 from openai import OpenAI
 from dotenv import load_dotenv
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types
+import httpx
+from tenacity import (
+    RetryCallState, retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+)
 # Load environment variables
 load_dotenv()
 
@@ -55,129 +67,259 @@ def extract_atividades_text(atividades: List[Dict]) -> str:
     return "\n\n".join(text_parts)
 
 
-def generate_embedding(text: str, max_retries: int = 3) -> Optional[List[float]]:
+# Texts sent per embed_content call (Gemini accepts up to 100 per request)
+EMBEDDING_BATCH_SIZE = 100
+
+EMBEDDING_MODEL = 'gemini-embedding-001'
+
+# Report sections that get an embedding
+EMBEDDED_SECTIONS = ('sobre_empresa', 'atividades_realizadas', 'conclusao')
+
+# Reports fetched per round-trip while streaming the reports table
+REPORTS_PER_FETCH = 200
+
+# Embedding requests in flight at the same time (keep within the API rate limit)
+EMBEDDING_WORKERS = 4
+
+# Embeddings of recently embedded texts, keyed by content hash, so sections
+# repeated across reports (boilerplate company descriptions) are embedded once
+EMBEDDING_CACHE_SIZE = 10_000
+
+_embedding_cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+
+def truncate_text(text: str, max_chars: int = 18000) -> str:
+    """Truncate text to stay within the embedding model's token limit"""
+    if len(text) > max_chars:
+        return text[:max_chars] + "..."
+    return text
+
+
+def _is_transient_error(error: BaseException) -> bool:
+    """Errors worth retrying: server errors, rate limiting and network failures"""
+    if isinstance(error, genai_errors.ServerError):
+        return True
+    if isinstance(error, genai_errors.ClientError):
+        return error.code == 429
+    return isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError))
+
+
+def _log_retry(retry_state: RetryCallState) -> None:
+    print(f"      Retry {retry_state.attempt_number} after {retry_state.next_action.sleep:.1f}s...")
+
+
+# Jittered exponential backoff, so concurrent workers hitting the same rate
+# limit don't all retry in lockstep
+@retry(
+    wait=wait_random_exponential(min=1, max=16),
+    stop=stop_after_attempt(3),
+    retry=retry_if_exception(_is_transient_error),
+    before_sleep=_log_retry,
+    reraise=True
+)
+def _embed_content(texts: List[str]) -> List[List[float]]:
+    """Embed a batch of texts with a single API call"""
+    result = client.models.embed_content(
+        model=EMBEDDING_MODEL,
+        contents=texts,
+        config=types.EmbedContentConfig(
+            output_dimensionality=1536,
+            task_type="retrieval_document",
+            title="Document chunk"
+            )
+        )
+    
+    if result.embeddings and len(result.embeddings) == len(texts):
+        return [embedding.values for embedding in result.embeddings]
+    raise ValueError(
+        f"Expected {len(texts)} embeddings, got {len(result.embeddings or [])}"
+    )
+
+
+def _request_embeddings(texts: List[str], max_retries: int) -> List[Optional[List[float]]]:
     """
-    Generate embedding for text using OpenAI API with retry logic
+    Generate embeddings for a batch of texts with a single API call,
+    retrying transient errors. Returns one embedding (or None) per input text.
+    Texts are sent as-is (already truncated by generate_embeddings).
     """
-    if not text or not text.strip():
-        return None
+    if not texts:
+        return []
     
-    for attempt in range(max_retries):
-        try:
-            # Truncate text if too long (OpenAI has token limits)
-            max_chars = 18000  # Conservative limit
-            if len(text) > max_chars:
-                text = text[:max_chars] + "..."
-            
-            # response = client.embeddings.create(
-            #     model="text-embedding-3-small",  # Cheaper and faster model
-            #     input=text,
-            #     dimensions=1536  # Match our database schema
-            #         config=types.EmbedContentConfig(output_dimensionality=768)
+    try:
+        return _embed_content.retry_with(stop=stop_after_attempt(max_retries))(texts)
+    except Exception as e:
+        print(f"      ❌ Failed to generate embeddings: {e}")
+        return [None] * len(texts)
 
-            # )
-            
-            # return response.data[0].embedding
-
-            result = client.models.embed_content(
-                model='gemini-embedding-001',
-                contents=text,
-                config=types.EmbedContentConfig(
-                    output_dimensionality=1536,
-                    task_type="retrieval_document",
-                    title="Document chunk"
-                    )
-                )
-            
-        ## google ai embedding:
-            if result.embeddings:
-                print('tamanho embedding', len(result.embeddings[0].values) if result.embeddings else None)
-                return result.embeddings[0].values
 
-            
-        except Exception as e:
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt  # Exponential backoff
-                print(f"      Retry {attempt + 1}/{max_retries} after {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                print(f"      ❌ Failed after {max_retries} attempts: {e}")
-                return None
+def _content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
 
 
-def process_report_embeddings(session, report: Relatorio) -> Dict[str, bool]:
+def generate_embeddings(texts: List[str], max_retries: int = 3) -> List[Optional[List[float]]]:
     """
-    Generate embeddings for all sections of a report
+    Generate embeddings for a batch of texts, one embedding (or None) per
+    input text. Texts embedded before are served from the in-memory cache,
+    then from the embedding_cache table; the distinct remaining ones are
+    sent in a single API call and added to both.
     """
-    results = {}
-    json_data = report.json_completo
+    if not texts:
+        return []
+    
+    # Normalize and truncate once: the cache key is the hash of exactly
+    # what is sent to the API
+    contents = [truncate_text(text.strip()) for text in texts]
+    keys = [_content_hash(content) for content in contents]
+    embeddings = []
+    missing: Dict[bytes, str] = {}
+    with _embedding_cache_lock:
+        for key, content in zip(keys, contents):
+            embedding = _embedding_cache.get(key)
+            if embedding is not None:
+                _embedding_cache.move_to_end(key)
+            elif key not in missing:
+                missing[key] = content
+            embeddings.append(embedding)
     
-    # Check if embeddings already exist
-    existing_embeddings = session.query(RelatorioEmbedding).filter_by(
-        relatorio_id=report.id
-    ).all()
+    if not missing:
+        return embeddings
     
-    existing_sections = {e.secao for e in existing_embeddings}
+    fetched = fetch_cached_embeddings(list(missing), EMBEDDING_MODEL)
+    to_request = [key for key in missing if key not in fetched]
+    if to_request:
+        requested = _request_embeddings([missing[key] for key in to_request], max_retries)
+        new_rows = [
+            (key, embedding)
+            for key, embedding in zip(to_request, requested)
+            if embedding is not None
+        ]
+        store_cached_embeddings(new_rows, EMBEDDING_MODEL)
+        fetched.update(zip(to_request, requested))
     
+    with _embedding_cache_lock:
+        for key, embedding in fetched.items():
+            if embedding is not None:
+                _embedding_cache[key] = embedding
+                _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    
+    return [
+        embedding if embedding is not None else fetched[key]
+        for key, embedding in zip(keys, embeddings)
+    ]
+
+
+def generate_embedding(text: str, max_retries: int = 3) -> Optional[List[float]]:
+    """
+    Generate embedding for a single text
+    """
+    if not text or not text.strip():
+        return None
+    
+    return generate_embeddings([text], max_retries)[0]
+
+
+def collect_report_sections(report, existing: Set[Tuple[int, str]]) -> List[Tuple[str, str]]:
+    """
+    Collect the (secao, conteudo) pairs of a report that still need an embedding
+    
+    Args:
+        report: Row with the report id and one column per EMBEDDED_SECTIONS entry
+        existing: (relatorio_id, secao) pairs that already have an embedding
+    """
     sections_to_process = []
     
     # 1. Sobre a empresa
-    if 'sobre_empresa' not in existing_sections:
-        sobre_empresa = json_data.get('sobre_empresa', '')
-        if sobre_empresa:
-            sections_to_process.append(('sobre_empresa', sobre_empresa))
+    if (report.id, 'sobre_empresa') not in existing and report.sobre_empresa:
+        sections_to_process.append(('sobre_empresa', report.sobre_empresa))
     
     # 2. Atividades realizadas
-    if 'atividades_realizadas' not in existing_sections:
-        atividades = json_data.get('atividades_realizadas', [])
-        atividades_text = extract_atividades_text(atividades)
+    if (report.id, 'atividades_realizadas') not in existing:
+        atividades_text = extract_atividades_text(report.atividades_realizadas)
         if atividades_text:
             sections_to_process.append(('atividades_realizadas', atividades_text))
     
     # 3. Conclusão
-    if 'conclusao' not in existing_sections:
-        conclusao = json_data.get('conclusao', '')
-        if conclusao:
-            sections_to_process.append(('conclusao', conclusao))
-    
-    if not sections_to_process:
-        print(f"   ⚠️  Report {report.id}: All embeddings already exist")
-        return {'skipped': True}
-    
-    # Generate embeddings for missing sections
-    for secao, conteudo in sections_to_process:
-        print(f"      Generating embedding for '{secao}'...")
-        embedding = generate_embedding(conteudo)
-        if embedding:
-            embedding_obj = RelatorioEmbedding(
-                relatorio_id=report.id,
-                secao=secao,
-                conteudo=conteudo[:5000],  # Store truncated content
-                embedding=embedding,
-                modelo='gemini-embedding-001'
-            )
-            session.add(embedding_obj)
-            results[secao] = True
-        else:
-            results[secao] = False
+    if (report.id, 'conclusao') not in existing and report.conclusao:
+        sections_to_process.append(('conclusao', report.conclusao))
+    
+    return sections_to_process
+
+
+def flush_embeddings(pending: List[Tuple[int, str, str]]) -> Tuple[int, int]:
+    """
+    Generate embeddings for the pending (relatorio_id, secao, conteudo)
+    sections with one API call and bulk insert them
+    
+    Returns:
+        (embeddings created, sections that failed)
+    """
+    if not pending:
+        return 0, 0
+    
+    print(f"   Generating {len(pending)} embeddings in one request...")
+    embeddings = generate_embeddings([conteudo for _, _, conteudo in pending])
     
-    if any(results.values()):
-        session.commit()
+    rows = [
+        (
+            relatorio_id,
+            secao,
+            conteudo[:5000],  # Store truncated content
+            np.asarray(embedding, dtype=np.float16),
+            EMBEDDING_MODEL
+        )
+        for (relatorio_id, secao, conteudo), embedding in zip(pending, embeddings)
+        if embedding
+    ]
     
-    return results
+    if rows:
+        bulk_insert_embeddings(rows)
+    
+    return len(rows), len(pending) - len(rows)
+
+
+def store_batch(batch: List[Tuple[int, str, str]]) -> Tuple[int, int]:
+    """Embed and store one batch, reporting errors instead of raising"""
+    try:
+        created, failed = flush_embeddings(batch)
+    except Exception as e:
+        print(f"   ❌ Error storing embeddings: {e}")
+        return 0, len(batch)
+    print(f"   ✅ Generated {created} embeddings")
+    return created, failed
 
 
 def generate_all_embeddings():
     """
     Generate embeddings for all reports in the database
+    
+    Sections from consecutive reports are accumulated and embedded
+    EMBEDDING_BATCH_SIZE at a time, so the API round-trips are per batch
+    instead of per section; up to EMBEDDING_WORKERS batches are in flight.
     """
     engine = create_engine(settings.DATABASE_URL)
     Session = sessionmaker(bind=engine)
     session = Session()
     
-    # Get all reports
-    reports = session.query(Relatorio).all()
-    total_reports = len(reports)
+    # Stream reports in batches (server-side cursor); only the embedded
+    # sections are extracted from json_completo (jsonb -> key), so the
+    # full document never leaves the database
+    total_reports = session.scalar(select(func.count(Relatorio.id)))
+    reports = session.execute(
+        select(
+            Relatorio.id,
+            Relatorio.empresa_razao_social,
+            *(Relatorio.json_completo[secao].label(secao) for secao in EMBEDDED_SECTIONS)
+        )
+        .execution_options(yield_per=REPORTS_PER_FETCH)
+    )
+    
+    # Sections that already have an embedding, fetched once for all reports
+    existing = set(session.execute(
+        select(RelatorioEmbedding.relatorio_id, RelatorioEmbedding.secao)
+    ).tuples())
     
     print(f"Found {total_reports} reports to process")
     print("=" * 60)
@@ -186,33 +328,52 @@ def generate_all_embeddings():
         'processed': 0,
         'skipped': 0,
         'errors': 0,
-        'embeddings_created': 0
+        'embeddings_created': 0,
+        'embeddings_failed': 0
     }
     
-    for i, report in enumerate(reports, 1):
-        print(f"\n[{i}/{total_reports}] Processing report ID {report.id}")
-        print(f"   Company: {report.empresa_razao_social}")
-        
-        try:
-            results = process_report_embeddings(session, report)
+    pending: List[Tuple[int, str, str]] = []
+    futures = []
+    
+    # Batches are embedded and stored by worker threads while the remaining
+    # reports are still being collected
+    with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+        for i, report in enumerate(reports, 1):
+            print(f"\n[{i}/{total_reports}] Processing report ID {report.id}")
+            print(f"   Company: {report.empresa_razao_social}")
             
-            if results.get('skipped'):
-                stats['skipped'] += 1
-            else:
-                stats['processed'] += 1
-                successful_sections = sum(1 for v in results.values() if v is True)
-                stats['embeddings_created'] += successful_sections
-                print(f"   ✅ Generated {successful_sections} embeddings")
+            try:
+                sections = collect_report_sections(report, existing)
                 
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
-            stats['errors'] += 1
-            session.rollback()
+                if not sections:
+                    print(f"   ⚠️  Report {report.id}: All embeddings already exist")
+                    stats['skipped'] += 1
+                    continue
+                
+                # Keep each request within EMBEDDING_BATCH_SIZE texts
+                if len(pending) + len(sections) > EMBEDDING_BATCH_SIZE:
+                    futures.append(executor.submit(store_batch, pending))
+                    pending = []
+                
+                stats['processed'] += 1
+                pending.extend((report.id, secao, conteudo) for secao, conteudo in sections)
+                print(f"   Queued {len(sections)} sections")
+                    
+            except Exception as e:
+                print(f"   ❌ Error: {e}")
+                stats['errors'] += 1
+        
+        if pending:
+            futures.append(executor.submit(store_batch, pending))
         
-        # Rate limiting (be nice to OpenAI API)
-        if i < total_reports:
-            time.sleep(0.5)  # Small delay between reports
+        for future in as_completed(futures):
+            created, failed = future.result()
+            stats['embeddings_created'] += created
+            stats['embeddings_failed'] += failed
     
+    # Final count on the same session (rows inserted by the workers are
+    # already committed, so they're visible under READ COMMITTED)
+    total_embeddings = session.scalar(select(func.count(RelatorioEmbedding.id)))
     session.close()
     
     print("\n" + "=" * 60)
@@ -221,13 +382,9 @@ def generate_all_embeddings():
     print(f"✅ Processed: {stats['processed']} reports")
     print(f"⚠️  Skipped: {stats['skipped']} reports")
     print(f"❌ Errors: {stats['errors']} reports")
+    print(f"❌ Failed embeddings: {stats['embeddings_failed']}")
     print(f"🎯 Total embeddings created: {stats['embeddings_created']}")
-    
-    # Query final count
-    session = Session()
-    total_embeddings = session.query(RelatorioEmbedding).count()
     print(f"📊 Total embeddings in database: {total_embeddings}")
-    session.close()
 
 
 def main():
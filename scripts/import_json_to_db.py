@@ -4,29 +4,70 @@ Import JSON reports into the database with metadata extraction
 """
 import sys
 import os
-import json
 import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+
+import orjson
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import make_transient, sessionmaker
 from backend.app.models.models import (
     Relatorio, CursoEnum, PeriodoEnum, AnoAcademicoEnum
 )
 from backend.app.core.config import settings
 
 
+# Reports inserted per transaction
+IMPORT_BATCH_SIZE = 500
+
+# Folder name: {ano}-{periodo}-{ano_academico}roAno-{ordinal_estagio}
+FOLDER_NAME_PATTERN = re.compile(r'(\d{4})-(\w+)-(\d)roAno-(\d)')
+# 4-digit year inside a date string
+YEAR_PATTERN = re.compile(r'\b(20\d{2})\b')
+
+# Folder name period -> enum
+PERIODO_MAP = {
+    '1S': PeriodoEnum.PRIMEIRO_SEMESTRE,
+    '2S': PeriodoEnum.SEGUNDO_SEMESTRE,
+    '1Q': PeriodoEnum.PRIMEIRO_QUADRIMESTRE,
+    '2Q': PeriodoEnum.SEGUNDO_QUADRIMESTRE,
+    '3Q': PeriodoEnum.TERCEIRO_QUADRIMESTRE
+}
+
+# Folder name academic year -> enum
+ANO_ACADEMICO_MAP = {
+    '2': AnoAcademicoEnum.SEGUNDO,
+    '3': AnoAcademicoEnum.TERCEIRO,
+    '4': AnoAcademicoEnum.QUARTO,
+    '5': AnoAcademicoEnum.QUINTO
+}
+
+# Quadrimesters are Computação, semesters are Elétrica
+CURSO_BY_PERIODO = {
+    PeriodoEnum.PRIMEIRO_QUADRIMESTRE: CursoEnum.COMPUTACAO,
+    PeriodoEnum.SEGUNDO_QUADRIMESTRE: CursoEnum.COMPUTACAO,
+    PeriodoEnum.TERCEIRO_QUADRIMESTRE: CursoEnum.COMPUTACAO,
+    PeriodoEnum.PRIMEIRO_SEMESTRE: CursoEnum.ELETRICA,
+    PeriodoEnum.SEGUNDO_SEMESTRE: CursoEnum.ELETRICA
+}
+
+
+@lru_cache(maxsize=None)
 def parse_folder_name(folder_name):
     """
     Parse folder name to extract metadata
     Format: {ano}-{periodo}-{ano_academico}roAno-{ordinal_estagio}
     Example: 2025-2Q-3roAno-1
+    
+    Results are cached and shared between callers; don't mutate them.
     """
-    pattern = r'(\d{4})-(\w+)-(\d)roAno-(\d)'
-    match = re.match(pattern, folder_name)
+    match = FOLDER_NAME_PATTERN.match(folder_name)
     
     if not match:
         raise ValueError(f"Invalid folder name format: {folder_name}")
@@ -37,31 +78,16 @@ def parse_folder_name(folder_name):
     ordinal_estagio = int(match.group(4))
     
     # Map periodo string to enum
-    periodo_map = {
-        '1S': PeriodoEnum.PRIMEIRO_SEMESTRE,
-        '2S': PeriodoEnum.SEGUNDO_SEMESTRE,
-        '1Q': PeriodoEnum.PRIMEIRO_QUADRIMESTRE,
-        '2Q': PeriodoEnum.SEGUNDO_QUADRIMESTRE,
-        '3Q': PeriodoEnum.TERCEIRO_QUADRIMESTRE
-    }
-    
-    if periodo_str not in periodo_map:
+    if periodo_str not in PERIODO_MAP:
         raise ValueError(f"Invalid period: {periodo_str}")
     
-    periodo = periodo_map[periodo_str]
+    periodo = PERIODO_MAP[periodo_str]
     
     # Map ano academico to enum
-    ano_academico_map = {
-        '2': AnoAcademicoEnum.SEGUNDO,
-        '3': AnoAcademicoEnum.TERCEIRO,
-        '4': AnoAcademicoEnum.QUARTO,
-        '5': AnoAcademicoEnum.QUINTO
-    }
-    
-    if ano_academico_num not in ano_academico_map:
+    if ano_academico_num not in ANO_ACADEMICO_MAP:
         raise ValueError(f"Invalid academic year: {ano_academico_num}")
     
-    ano_academico = ano_academico_map[ano_academico_num]
+    ano_academico = ANO_ACADEMICO_MAP[ano_academico_num]
     
     return {
         'ano': ano,
@@ -76,13 +102,9 @@ def determine_curso(json_data, periodo):
     Determine the course type based on content and period
     """
     # Check the periodo type
-    if periodo in [PeriodoEnum.PRIMEIRO_QUADRIMESTRE, 
-                    PeriodoEnum.SEGUNDO_QUADRIMESTRE, 
-                    PeriodoEnum.TERCEIRO_QUADRIMESTRE]:
-        return CursoEnum.COMPUTACAO
-    elif periodo in [PeriodoEnum.PRIMEIRO_SEMESTRE, 
-                      PeriodoEnum.SEGUNDO_SEMESTRE]:
-        return CursoEnum.ELETRICA
+    curso = CURSO_BY_PERIODO.get(periodo)
+    if curso is not None:
+        return curso
     
     # Fallback: check if curso field contains "Computação"
     curso_field = json_data.get('estagiario', {}).get('curso', '')
@@ -100,20 +122,24 @@ def extract_year_from_date(date_str):
         return None
     
     # Try to find 4-digit year
-    year_match = re.search(r'\b(20\d{2})\b', date_str)
+    year_match = YEAR_PATTERN.search(date_str)
     if year_match:
         return int(year_match.group(1))
     
     return None
 
 
-def import_json_file(session, file_path, folder_metadata):
+def parse_json_file(file_path, folder_metadata):
     """
-    Import a single JSON file into the database
+    Read a JSON report and extract the Relatorio column values
+    
+    Doesn't touch the database, so it can run in a worker process.
+    
+    Returns:
+        (column values, None) on success, (None, error message) on error
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            json_data = json.load(f)
+        json_data = orjson.loads(file_path.read_bytes())
         
         # Extract empresa info
         empresa_razao_social = json_data.get('estagio', {}).get('razao_social_empresa')
@@ -126,50 +152,91 @@ def import_json_file(session, file_path, folder_metadata):
             empresa_cnpj = json_data.get('estagio', {}).get('empresa_cnpj')
         
         # Try to extract year from dates if not in folder
-        if not folder_metadata.get('ano'):
+        ano = folder_metadata.get('ano')
+        if not ano:
             periodo_inicio = json_data.get('estagio', {}).get('periodo_inicio')
-            ano_from_date = extract_year_from_date(periodo_inicio)
-            if ano_from_date:
-                folder_metadata['ano'] = ano_from_date
+            ano = extract_year_from_date(periodo_inicio)
         
         # Determine curso
         curso = determine_curso(json_data, folder_metadata['periodo'])
         
-        # Check if report already exists (by arquivo_origem)
-        arquivo_origem = file_path.name
-        existing = session.query(Relatorio).filter_by(
-            arquivo_origem=arquivo_origem,
-            folder_origin=file_path.parent.name
-        ).first()
-        
-        if existing:
-            print(f"  ⚠️  Skipping (already exists): {arquivo_origem}")
-            return False
-        
-        # Create new report
-        report = Relatorio(
-            json_completo=json_data,
-            ano=folder_metadata['ano'],
-            periodo=folder_metadata['periodo'],
-            ano_academico=folder_metadata['ano_academico'],
-            ordinal_estagio=folder_metadata['ordinal_estagio'],
-            curso=curso,
-            empresa_razao_social=empresa_razao_social,
-            empresa_cnpj=empresa_cnpj,
-            folder_origin=file_path.parent.name,
-            arquivo_origem=arquivo_origem
-        )
+        return {
+            'json_completo': json_data,
+            'ano': ano,
+            'periodo': folder_metadata['periodo'],
+            'ano_academico': folder_metadata['ano_academico'],
+            'ordinal_estagio': folder_metadata['ordinal_estagio'],
+            'curso': curso,
+            'empresa_razao_social': empresa_razao_social,
+            'empresa_cnpj': empresa_cnpj,
+            'folder_origin': file_path.parent.name,
+            'arquivo_origem': file_path.name,
+        }, None
         
+    except Exception as e:
+        return None, str(e)
+
+
+def list_json_files(folder):
+    """List the JSON files of a folder with a single directory scan"""
+    with os.scandir(folder) as entries:
+        return [
+            Path(entry.path) for entry in entries
+            if entry.name.endswith('.json') and entry.is_file()
+        ]
+
+
+def save_report(session, report):
+    """
+    Insert a single report in its own transaction
+    
+    Returns:
+        True if the report was imported
+    """
+    try:
         session.add(report)
+        session.flush()
+        imported = (report.arquivo_origem, report.id)
         session.commit()
-        
-        print(f"  ✅ Imported: {arquivo_origem} (ID: {report.id})")
-        return True
-        
     except Exception as e:
-        print(f"  ❌ Error importing {file_path.name}: {e}")
+        print(f"  ❌ Error importing {report.arquivo_origem}: {e}")
         session.rollback()
         return False
+    
+    print(f"  ✅ Imported: {imported[0]} (ID: {imported[1]})")
+    return True
+
+
+def save_reports(session, batch):
+    """
+    Insert a batch of reports in a single transaction, falling back to one
+    transaction per report when the batch fails
+    
+    Returns:
+        Number of reports imported
+    """
+    if not batch:
+        return 0
+    
+    try:
+        # SQLAlchemy groups the INSERTs into multi-row statements
+        session.add_all(batch)
+        session.flush()
+        # Read before commit: expire_on_commit would reload each report
+        imported = [(report.arquivo_origem, report.id) for report in batch]
+        session.commit()
+    except Exception as e:
+        print(f"  ⚠️  Error importing batch of {len(batch)} reports, retrying one by one: {e}")
+        session.rollback()
+        for report in batch:
+            # Discard the state left by the failed flush
+            make_transient(report)
+            report.id = None
+        return sum(save_report(session, report) for report in batch)
+    
+    for arquivo_origem, report_id in imported:
+        print(f"  ✅ Imported: {arquivo_origem} (ID: {report_id})")
+    return len(imported)
 
 
 def import_all_json_files():
@@ -186,40 +253,73 @@ def import_all_json_files():
     Session = sessionmaker(bind=engine)
     session = Session()
     
+    # Reports already in the database, fetched once for the whole import
+    existing = set(session.execute(
+        select(Relatorio.folder_origin, Relatorio.arquivo_origem)
+    ).tuples())
+    
     total_imported = 0
     total_skipped = 0
     total_errors = 0
     
-    # Iterate through folders
-    for folder in base_dir.iterdir():
-        if not folder.is_dir():
-            continue
-        
-        print(f"\n📁 Processing folder: {folder.name}")
-        
-        try:
-            # Parse folder metadata
-            folder_metadata = parse_folder_name(folder.name)
-            print(f"   Year: {folder_metadata['ano']}, "
-                  f"Period: {folder_metadata['periodo'].value}, "
-                  f"Academic Year: {folder_metadata['ano_academico'].value}, "
-                  f"Internship #: {folder_metadata['ordinal_estagio']}")
-        except ValueError as e:
-            print(f"  ⚠️  Skipping folder (invalid format): {e}")
-            continue
-        
-        # Process JSON files in folder
-        json_files = list(folder.glob('*.json'))
-        print(f"   Found {len(json_files)} JSON files")
+    # JSON files are parsed in worker processes; the reports are built and
+    # inserted here, in a single session
+    with ProcessPoolExecutor() as executor:
+        # Iterate through folders (DirEntry.is_dir uses the type returned by
+        # the directory listing, no extra stat per entry)
+        with os.scandir(base_dir) as entries:
+            folders = [Path(entry.path) for entry in entries if entry.is_dir()]
         
-        for json_file in json_files:
-            result = import_json_file(session, json_file, folder_metadata)
-            if result:
-                total_imported += 1
-            elif result is False:
-                total_skipped += 1
-            else:
-                total_errors += 1
+        for folder in folders:
+            print(f"\n📁 Processing folder: {folder.name}")
+            
+            try:
+                # Parse folder metadata
+                folder_metadata = parse_folder_name(folder.name)
+                print(f"   Year: {folder_metadata['ano']}, "
+                      f"Period: {folder_metadata['periodo'].value}, "
+                      f"Academic Year: {folder_metadata['ano_academico'].value}, "
+                      f"Internship #: {folder_metadata['ordinal_estagio']}")
+            except ValueError as e:
+                print(f"  ⚠️  Skipping folder (invalid format): {e}")
+                continue
+            
+            # Process JSON files in folder
+            json_files = list_json_files(folder)
+            print(f"   Found {len(json_files)} JSON files")
+            
+            # Check if reports already exist (by arquivo_origem), before reading the files
+            new_files = []
+            for json_file in json_files:
+                if (folder.name, json_file.name) in existing:
+                    print(f"  ⚠️  Skipping (already exists): {json_file.name}")
+                    total_skipped += 1
+                else:
+                    new_files.append(json_file)
+            
+            parsed_files = executor.map(
+                parse_json_file, new_files, repeat(folder_metadata), chunksize=16
+            )
+            
+            batch = []
+            for json_file, (fields, error) in zip(new_files, parsed_files):
+                if error is not None:
+                    print(f"  ❌ Error importing {json_file.name}: {error}")
+                    total_errors += 1
+                    continue
+                
+                existing.add((folder.name, json_file.name))
+                batch.append(Relatorio(**fields))
+                
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    imported = save_reports(session, batch)
+                    total_imported += imported
+                    total_errors += len(batch) - imported
+                    batch = []
+            
+            imported = save_reports(session, batch)
+            total_imported += imported
+            total_errors += len(batch) - imported
     
     session.close()
     
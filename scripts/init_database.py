@@ -6,12 +6,18 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from psycopg2 import sql
 from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker
 from backend.app.models.models import Base, TermoTecnico, TipoTermoEnum
 from backend.app.core.config import settings
 
 
+# Fail fast on an unreachable server instead of waiting on the default timeout
+CONNECT_ARGS = {"connect_timeout": 5}
+
+
 def create_database_if_not_exists():
     """Create database if it doesn't exist"""
     # Connect to PostgreSQL without specifying a database
@@ -19,17 +25,22 @@ def create_database_if_not_exists():
     postgres_url = f"{db_url_parts[0]}/postgres"
     db_name = db_url_parts[1].split('?')[0]
     
-    engine = create_engine(postgres_url, isolation_level='AUTOCOMMIT')
+    engine = create_engine(
+        postgres_url, isolation_level='AUTOCOMMIT', connect_args=CONNECT_ARGS
+    )
     
     with engine.connect() as conn:
         # Check if database exists
         result = conn.execute(
-            text(f"SELECT 1 FROM pg_database WHERE datname = '{db_name}'")
+            text("SELECT 1 FROM pg_database WHERE datname = :db_name"),
+            {"db_name": db_name}
         )
         exists = result.fetchone() is not None
         
         if not exists:
-            conn.execute(text(f"CREATE DATABASE {db_name}"))
+            # Identifiers can't be bound as parameters; quote the name instead
+            with conn.connection.cursor() as cursor:
+                cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_name)))
             print(f"Database '{db_name}' created successfully!")
         else:
             print(f"Database '{db_name}' already exists.")
@@ -37,13 +48,14 @@ def create_database_if_not_exists():
 
 def init_database():
     """Initialize database schema and extensions"""
-    engine = create_engine(settings.DATABASE_URL)
+    engine = create_engine(settings.DATABASE_URL, connect_args=CONNECT_ARGS)
     
     # Create pgvector extension
     with engine.connect() as conn:
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         conn.commit()
-        print("pgvector extension enabled.")
+        print("pgvector and pg_trgm extensions enabled.")
     
     # Create all tables
     Base.metadata.create_all(bind=engine)
@@ -208,22 +220,18 @@ def populate_technical_terms(engine):
         ("Desktop", TipoTermoEnum.TIPO_PROJETO, "desktop"),
     ]
     
-    # Insert terms
-    count = 0
-    for termo, tipo, normalizado in terms_data:
-        # Check if term already exists
-        existing = session.query(TermoTecnico).filter_by(
-            termo=termo, tipo=tipo
-        ).first()
-        
-        if not existing:
-            new_term = TermoTecnico(
-                termo=termo,
-                tipo=tipo,
-                termo_normalizado=normalizado
-            )
-            session.add(new_term)
-            count += 1
+    # Insert all terms in one statement; terms already present are skipped
+    rows = [
+        {"termo": termo, "tipo": tipo, "termo_normalizado": normalizado}
+        for termo, tipo, normalizado in terms_data
+    ]
+    inserted = session.scalars(
+        pg_insert(TermoTecnico)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["termo", "tipo"])
+        .returning(TermoTecnico.id)
+    ).all()
+    count = len(inserted)
     
     session.commit()
     session.close()
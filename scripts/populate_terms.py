@@ -4,45 +4,120 @@ Extract and map technical terms from reports to the normalized terms table
 """
 import sys
 import os
-import re
-from typing import List, Dict, Set
+from typing import Any, Dict, Iterable, List, Set, Tuple
 from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
+
+import ahocorasick
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import load_only, sessionmaker
 from backend.app.models.models import (
     Relatorio, RelatorioTermo, TermoTecnico
 )
 from backend.app.core.config import settings
+from backend.app.db.database import bulk_insert_report_terms
+
+
+# relatorio_termos rows buffered across reports before each bulk insert
+TERMS_BATCH_SIZE = 5000
+
+# Reports fetched per round-trip while streaming the reports table
+REPORTS_PER_FETCH = 500
+
+# Fail fast on an unreachable server instead of waiting on the default timeout
+CONNECT_ARGS = {"connect_timeout": 5}
+
+
+def _is_word_char(char: str) -> bool:
+    """Word character as in the re module's \\b (alphanumeric or underscore)"""
+    return char.isalnum() or char == '_'
 
 
-def extract_terms_from_text(text: str, termos_dict: Dict[str, int]) -> List[int]:
+def build_term_automaton(termos_dict: Dict[str, int]) -> ahocorasick.Automaton:
+    """
+    Build an Aho-Corasick automaton over the lowercased terms, so each text
+    is scanned once for all terms instead of once per term
+    
+    Each word maps to (length, starts with a word char, ends with a word char,
+    IDs of every term with that lowercase form).
+    """
+    ids_by_word: Dict[str, List[int]] = {}
+    for termo, termo_id in termos_dict.items():
+        if termo:
+            ids_by_word.setdefault(termo.lower(), []).append(termo_id)
+    
+    automaton = ahocorasick.Automaton()
+    for word, termo_ids in ids_by_word.items():
+        automaton.add_word(
+            word,
+            (len(word), _is_word_char(word[0]), _is_word_char(word[-1]), tuple(termo_ids))
+        )
+    automaton.make_automaton()
+    return automaton
+
+
+def _scan_terms(text: str, automaton: ahocorasick.Automaton, found_terms: Set[int]) -> None:
+    """Add the IDs of the terms found in text to found_terms"""
+    text_lower = text.lower()
+    last = len(text_lower) - 1
+    
+    # Single pass over the text, reporting every occurrence of every term
+    for end, (length, starts_word, ends_word, termo_ids) in automaton.iter(text_lower):
+        start = end - length + 1
+        # Same word boundaries as r'\bterm\b', for more accurate matching
+        # This prevents matching "Java" in "JavaScript"
+        word_before = start > 0 and _is_word_char(text_lower[start - 1])
+        word_after = end < last and _is_word_char(text_lower[end + 1])
+        if word_before != starts_word and word_after != ends_word:
+            found_terms.update(termo_ids)
+
+
+def extract_terms_from_text(text: str, automaton: ahocorasick.Automaton) -> List[int]:
     """
     Extract technical terms from text using case-insensitive matching
     Returns list of term IDs found in the text
     """
-    if not text:
+    if not text or len(automaton) == 0:
         return []
     
     found_terms = set()
-    text_lower = text.lower()
-    
-    # Check each known term
-    for termo, termo_id in termos_dict.items():
-        # Use word boundaries for more accurate matching
-        # This prevents matching "Java" in "JavaScript"
-        pattern = r'\b' + re.escape(termo.lower()) + r'\b'
-        if re.search(pattern, text_lower):
-            found_terms.add(termo_id)
-    
+    _scan_terms(text, automaton, found_terms)
     return list(found_terms)
 
 
-def process_report_terms(session, report: Relatorio, termos_dict: Dict[str, int]) -> Dict:
+def extract_terms_from_texts(texts: Iterable[Any], automaton: ahocorasick.Automaton) -> Set[int]:
+    """
+    Extract technical terms from several fields, scanning each one in place
+    instead of joining them into a single string first
+    Returns set of term IDs found in any of the texts (empty fields are skipped)
+    """
+    found_terms = set()
+    if len(automaton) == 0:
+        return found_terms
+    
+    for text in texts:
+        if text:
+            _scan_terms(text if isinstance(text, str) else str(text), automaton, found_terms)
+    return found_terms
+
+
+def process_report_terms(
+    report_id: int, json_data: Dict, automaton: ahocorasick.Automaton
+) -> Tuple[Dict, List[Tuple[int, int, str, int]]]:
     """
     Extract and map terms from a single report
+    
+    Args:
+        report_id: Report ID
+        json_data: The report's json_completo
+        automaton: Term automaton from build_term_automaton
+    
+    Returns:
+        (stats, relatorio_termos rows to insert)
     """
     stats = {
         'sobre_empresa': 0,
@@ -51,21 +126,12 @@ def process_report_terms(session, report: Relatorio, termos_dict: Dict[str, int]
         'total': 0
     }
     
-    # Check if terms already extracted for this report
-    existing_terms = session.query(RelatorioTermo).filter_by(
-        relatorio_id=report.id
-    ).all()
-    
-    if existing_terms:
-        return {'skipped': True, 'existing': len(existing_terms)}
-    
-    json_data = report.json_completo
     all_terms = []
     
     # 1. Extract from sobre_empresa
     sobre_empresa = json_data.get('sobre_empresa', '')
     if sobre_empresa:
-        terms = extract_terms_from_text(sobre_empresa, termos_dict)
+        terms = extract_terms_from_text(sobre_empresa, automaton)
         for termo_id in terms:
             all_terms.append((termo_id, 'sobre_empresa'))
         stats['sobre_empresa'] = len(terms)
@@ -73,15 +139,13 @@ def process_report_terms(session, report: Relatorio, termos_dict: Dict[str, int]
     # 2. Extract from atividades_realizadas
     atividades = json_data.get('atividades_realizadas', [])
     for atividade in atividades:
-        combined_text = ' '.join([
-            str(atividade.get('descricao') or ''),
-            str(atividade.get('tarefas_realizadas') or ''),
-            str(atividade.get('papel_exercido') or ''),
-            str(atividade.get('aprendizados') or ''),
-            str(atividade.get('comentarios') or '')
-        ])
-        
-        terms = extract_terms_from_text(combined_text, termos_dict)
+        terms = extract_terms_from_texts((
+            atividade.get('descricao'),
+            atividade.get('tarefas_realizadas'),
+            atividade.get('papel_exercido'),
+            atividade.get('aprendizados'),
+            atividade.get('comentarios')
+        ), automaton)
         for termo_id in terms:
             all_terms.append((termo_id, 'atividades_realizadas'))
     
@@ -92,7 +156,7 @@ def process_report_terms(session, report: Relatorio, termos_dict: Dict[str, int]
     # 3. Extract from conclusao
     conclusao = json_data.get('conclusao', '')
     if conclusao:
-        terms = extract_terms_from_text(conclusao, termos_dict)
+        terms = extract_terms_from_text(conclusao, automaton)
         for termo_id in terms:
             all_terms.append((termo_id, 'conclusao'))
         stats['conclusao'] = len(terms)
@@ -100,29 +164,62 @@ def process_report_terms(session, report: Relatorio, termos_dict: Dict[str, int]
     # Count frequency by section
     term_section_count = Counter(all_terms)
     
-    # Insert relationships
-    for (termo_id, secao), frequencia in term_section_count.items():
-        relatorio_termo = RelatorioTermo(
-            relatorio_id=report.id,
-            termo_id=termo_id,
-            secao=secao,
-            frequencia=frequencia
-        )
-        session.add(relatorio_termo)
+    # (relatorio_id, termo_id, secao, frequencia) rows, inserted later in
+    # bulk together with other reports' rows
+    rows = [
+        (report_id, termo_id, secao, frequencia)
+        for (termo_id, secao), frequencia in term_section_count.items()
+    ]
     
     stats['total'] = len({t[0] for t in all_terms})  # Unique terms count
     
-    if all_terms:
-        session.commit()
+    return stats, rows
+
+
+# Term automaton of each worker process, built once by _init_worker
+_worker_automaton = None
+
+
+def _init_worker(termos_dict: Dict[str, int]) -> None:
+    global _worker_automaton
+    _worker_automaton = build_term_automaton(termos_dict)
+
+
+def _extract_report_terms(item: Tuple[int, Dict]):
+    """
+    Worker process: extract the terms of one (report_id, json_completo) pair
     
-    return stats
+    Returns:
+        (report_id, stats, rows, error message or None)
+    """
+    report_id, json_data = item
+    try:
+        results, rows = process_report_terms(report_id, json_data, _worker_automaton)
+    except Exception as e:
+        return report_id, None, [], str(e)
+    return report_id, results, rows, None
+
+
+def flush_report_terms(rows: List[Tuple[int, int, str, int]]) -> int:
+    """
+    Bulk insert buffered relatorio_termos rows, reporting errors instead
+    of raising
+    
+    Returns:
+        Number of rows inserted (0 on error)
+    """
+    try:
+        return bulk_insert_report_terms(rows)
+    except Exception as e:
+        print(f"   ❌ Error inserting {len(rows)} report terms: {e}")
+        return 0
 
 
 def extract_all_terms():
     """
     Extract terms from all reports in the database
     """
-    engine = create_engine(settings.DATABASE_URL)
+    engine = create_engine(settings.DATABASE_URL, connect_args=CONNECT_ARGS)
     Session = sessionmaker(bind=engine)
     session = Session()
     
@@ -132,9 +229,20 @@ def extract_all_terms():
     
     print(f"Loaded {len(termos_dict)} technical terms")
     
-    # Get all reports
-    reports = session.query(Relatorio).all()
-    total_reports = len(reports)
+    # Reports that already have terms (with their row count), fetched once
+    existing_terms = dict(session.execute(
+        select(RelatorioTermo.relatorio_id, func.count())
+        .group_by(RelatorioTermo.relatorio_id)
+    ).tuples())
+    
+    # Stream reports in batches (server-side cursor) instead of loading
+    # every row, json_completo included, into memory at once
+    total_reports = session.scalar(select(func.count(Relatorio.id)))
+    reports = session.execute(
+        select(Relatorio)
+        .options(load_only(Relatorio.id, Relatorio.empresa_razao_social, Relatorio.json_completo))
+        .execution_options(yield_per=REPORTS_PER_FETCH)
+    ).scalars()
     
     print(f"Found {total_reports} reports to process")
     print("=" * 60)
@@ -143,20 +251,53 @@ def extract_all_terms():
         'processed': 0,
         'skipped': 0,
         'errors': 0,
-        'total_terms_found': 0
+        'total_terms_found': 0,
+        'rows_inserted': 0,
+        'rows_failed': 0
     }
     
-    for i, report in enumerate(reports, 1):
-        print(f"\n[{i}/{total_reports}] Processing report ID {report.id}")
-        print(f"   Company: {report.empresa_razao_social}")
-        
-        try:
-            results = process_report_terms(session, report, termos_dict)
+    # Rows are inserted on their own connection, so this session (and the
+    # reports loaded in it) is never committed or expired mid-loop
+    buffer: List[Tuple[int, int, str, int]] = []
+    
+    i = 0
+    
+    # Term extraction is pure CPU work: each batch of streamed reports is
+    # spread across worker processes, and the rows come back here to be
+    # inserted
+    with Pool(initializer=_init_worker, initargs=(termos_dict,)) as pool:
+        while True:
+            batch = list(islice(reports, REPORTS_PER_FETCH))
+            if not batch:
+                break
+            
+            companies = {}
+            items = []
+            for report in batch:
+                # Check if terms already extracted for this report
+                if report.id in existing_terms:
+                    i += 1
+                    print(f"\n[{i}/{total_reports}] Processing report ID {report.id}")
+                    print(f"   Company: {report.empresa_razao_social}")
+                    print(f"   ⚠️  Skipped (already has {existing_terms[report.id]} terms)")
+                    stats['skipped'] += 1
+                    continue
+                
+                companies[report.id] = report.empresa_razao_social
+                items.append((report.id, report.json_completo))
             
-            if results.get('skipped'):
-                stats['skipped'] += 1
-                print(f"   ⚠️  Skipped (already has {results.get('existing', 0)} terms)")
-            else:
+            for report_id, results, rows, error in pool.imap_unordered(
+                _extract_report_terms, items, chunksize=16
+            ):
+                i += 1
+                print(f"\n[{i}/{total_reports}] Processing report ID {report_id}")
+                print(f"   Company: {companies[report_id]}")
+                
+                if error is not None:
+                    print(f"   ❌ Error: {error}")
+                    stats['errors'] += 1
+                    continue
+                
                 stats['processed'] += 1
                 stats['total_terms_found'] += results.get('total', 0)
                 print(f"   ✅ Found terms: {results.get('total', 0)}")
@@ -164,10 +305,17 @@ def extract_all_terms():
                 print(f"      - atividades: {results.get('atividades_realizadas', 0)}")
                 print(f"      - conclusao: {results.get('conclusao', 0)}")
                 
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
-            stats['errors'] += 1
-            session.rollback()
+                buffer.extend(rows)
+                if len(buffer) >= TERMS_BATCH_SIZE:
+                    inserted = flush_report_terms(buffer)
+                    stats['rows_inserted'] += inserted
+                    stats['rows_failed'] += len(buffer) - inserted
+                    buffer = []
+    
+    if buffer:
+        inserted = flush_report_terms(buffer)
+        stats['rows_inserted'] += inserted
+        stats['rows_failed'] += len(buffer) - inserted
     
     session.close()
     
@@ -178,6 +326,9 @@ def extract_all_terms():
     print(f"⚠️  Skipped: {stats['skipped']} reports")
     print(f"❌ Errors: {stats['errors']} reports")
     print(f"🎯 Total terms found: {stats['total_terms_found']}")
+    print(f"📥 Report-term rows inserted: {stats['rows_inserted']}")
+    if stats['rows_failed']:
+        print(f"❌ Report-term rows failed: {stats['rows_failed']}")
     
     # Query statistics
     session = Session()
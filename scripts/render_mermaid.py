@@ -15,9 +15,42 @@ import sys
 import os
 import re
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 
+def render_diagram(mmd_path: Path, out_path: Path) -> None:
+    """Renderiza um .mmd via mermaid-cli (mmdc); o formato vem da extensão de out_path"""
+    subprocess.run([
+        "mmdc", "-i", str(mmd_path), "-o", str(out_path),
+        "-b", "transparent", "-t", "default"
+    ], check=True)
+
+
+def render_all(jobs) -> None:
+    """
+    Renderiza os pares (mmd_path, out_path) em paralelo. Cada chamada do mmdc
+    sobe seu próprio Chromium headless, então o tempo é dominado pela
+    inicialização e as chamadas rodam bem lado a lado (limitado ao nº de CPUs).
+    """
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {
+            executor.submit(render_diagram, mmd_path, out_path): mmd_path
+            for mmd_path, out_path in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except FileNotFoundError:
+                executor.shutdown(cancel_futures=True)
+                print("Erro: mmdc (mermaid-cli) não encontrado no PATH. Instale com: npm install -g @mermaid-js/mermaid-cli", file=sys.stderr)
+                sys.exit(1)
+            except subprocess.CalledProcessError as e:
+                executor.shutdown(cancel_futures=True)
+                print(f"Erro ao renderizar {futures[future]}: {e}", file=sys.stderr)
+                sys.exit(e.returncode)
+
+
 def extract_and_render(input_md: Path, output_md: Path, diagrams_dir: Path) -> None:
     diagrams_dir.mkdir(parents=True, exist_ok=True)
 
@@ -28,6 +61,7 @@ def extract_and_render(input_md: Path, output_md: Path, diagrams_dir: Path) -> N
     in_mermaid = False
     buf = []
     diagram_idx = 0
+    jobs = []
 
     fence_re = re.compile(r"^```\s*$")
 
@@ -69,24 +103,10 @@ def extract_and_render(input_md: Path, output_md: Path, diagrams_dir: Path) -> N
                 
                 mmd_path.write_text(content, encoding='utf-8')
 
-                # Render via mermaid-cli (mmdc)
-                try:
-                    # Render SVG
-                    subprocess.run([
-                        "mmdc", "-i", str(mmd_path), "-o", str(svg_path),
-                        "-b", "transparent", "-t", "default"
-                    ], check=True)
-                    # Render PNG (better compatibility with PDF engines)
-                    subprocess.run([
-                        "mmdc", "-i", str(mmd_path), "-o", str(png_path),
-                        "-b", "transparent", "-t", "default"
-                    ], check=True)
-                except FileNotFoundError:
-                    print("Erro: mmdc (mermaid-cli) não encontrado no PATH. Instale com: npm install -g @mermaid-js/mermaid-cli", file=sys.stderr)
-                    sys.exit(1)
-                except subprocess.CalledProcessError as e:
-                    print(f"Erro ao renderizar {mmd_path}: {e}", file=sys.stderr)
-                    sys.exit(e.returncode)
+                # SVG e PNG (PNG tem melhor compatibilidade com engines de PDF)
+                # são renderizados depois, todos em paralelo
+                jobs.append((mmd_path, svg_path))
+                jobs.append((mmd_path, png_path))
 
                 # Inserir referência de imagem relativa ao output_md dentro de docs/
                 # Assumindo que output_md está em docs/, usar caminho relativo "diagrams/..."
@@ -105,6 +125,8 @@ def extract_and_render(input_md: Path, output_md: Path, diagrams_dir: Path) -> N
         out_lines.extend(buf)
         out_lines.append("```\n")
 
+    render_all(jobs)
+
     output_md.write_text("".join(out_lines), encoding='utf-8')
 
 
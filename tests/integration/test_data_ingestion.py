@@ -152,7 +152,7 @@ def test_search_capability():
         
         result = session.execute(text("""
             SELECT r.id, r.empresa_razao_social,
-                   e.embedding <-> CAST(:test_vector AS vector) as distance
+                   e.embedding <-> CAST(:test_vector AS halfvec) as distance
             FROM relatorio_embeddings e
             JOIN relatorios r ON r.id = e.relatorio_id
             WHERE e.embedding IS NOT NULL
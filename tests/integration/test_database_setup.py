@@ -215,7 +215,7 @@ def test_vector_similarity_search():
         result = session.execute(
             text("""
                 SELECT r.id, r.empresa_razao_social, 
-                       e.embedding <-> CAST(:query_vector AS vector) as distance
+                       e.embedding <-> CAST(:query_vector AS halfvec) as distance
                 FROM relatorio_embeddings e
                 JOIN relatorios r ON r.id = e.relatorio_id
                 ORDER BY distance
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the precompiled query parsing patterns of the chat agent
+"""
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pytest
+
+pytest.importorskip("pydantic_ai")
+pytest.importorskip("sqlalchemy")
+
+from backend.app.agents import chat_agent
+from backend.app.agents.chat_agent import (
+    ACTIVITY_TYPE_PATTERNS,
+    COMPANY_MENTION_PATTERN,
+    YEAR_PATTERN,
+    analyze_query_intent_fallback,
+    get_technology_key_patterns,
+)
+
+
+TECHNOLOGY_KEYWORDS = {
+    'python': 'Python',
+    'go': 'Go',
+    'react': 'React',
+    'react native': 'React Native',
+}
+
+
+def analyze(message, monkeypatch):
+    """Run the keyword-based intent analysis with a fixed keyword mapping"""
+    monkeypatch.setattr(chat_agent, "get_technology_keywords", lambda db: TECHNOLOGY_KEYWORDS)
+    return asyncio.run(analyze_query_intent_fallback(message, None))
+
+
+def test_year_pattern():
+    """Only standalone 20xx years are extracted"""
+    assert YEAR_PATTERN.search("relatórios de 2019").group(1) == "2019"
+    assert YEAR_PATTERN.search("relatórios de 1999") is None
+    assert YEAR_PATTERN.search("código 20234") is None
+
+
+def test_company_mention_pattern():
+    """Company names after na/no/em are captured, including accents"""
+    match = COMPANY_MENTION_PATTERN.search("O que os estagiários fazem na Votorantim Cimentos?")
+    assert match.group(1).strip() == "Votorantim Cimentos"
+
+    match = COMPANY_MENTION_PATTERN.search("Atividades no Itaú")
+    assert match.group(1).strip() == "Itaú"
+
+
+def test_activity_type_patterns():
+    """Activity types are detected by keyword substrings"""
+    content = "realizei testes unitários e a documentação da api"
+    detected = {name for name, pattern in ACTIVITY_TYPE_PATTERNS.items() if pattern.search(content)}
+    assert {'Testes', 'Documentação', 'Integração'} <= detected
+    assert 'Manutenção' not in detected
+
+
+def test_technology_key_patterns():
+    """Keys are ordered longest first; only short keys need word boundaries"""
+    key_patterns = get_technology_key_patterns(TECHNOLOGY_KEYWORDS)
+
+    assert [key for key, _ in key_patterns][0] == 'react native'
+    patterns = dict(key_patterns)
+    assert patterns['python'] is None
+    assert patterns['go'].search("usa go no backend")
+    assert not patterns['go'].search("algoritmos")
+
+
+def test_intent_company_and_year(monkeypatch):
+    """Company and year filters are extracted from the message"""
+    intent = analyze("Quais linguagens a Petrobras usou em 2023?", monkeypatch)
+
+    assert intent.main_topic == "technology"
+    assert intent.technology_type == "LINGUAGEM"
+    assert intent.company_filter == "Petrobras"
+    assert intent.year_filter == 2023
+
+
+def test_intent_activities_at_company(monkeypatch):
+    """Activities queries keep the full company name"""
+    intent = analyze("Quais atividades são feitas na Votorantim Cimentos?", monkeypatch)
+
+    assert intent.main_topic == "activities"
+    assert intent.company_filter == "Votorantim Cimentos"
+    assert intent.year_filter is None
+
+
+def test_intent_reverse_technology(monkeypatch):
+    """A technology plus a company question is a reverse search"""
+    intent = analyze("Qual empresa usa Python?", monkeypatch)
+
+    assert intent.main_topic == "reverse_technology"
+    assert intent.specific_technology == "Python"
+    assert intent.company_filter is None
+
+
+def test_intent_short_technology_needs_word_boundary(monkeypatch):
+    """Short technology names are not matched inside other words"""
+    assert analyze("Quais algoritmos são estudados?", monkeypatch).specific_technology is None
+    assert analyze("Quais empresas usam Go?", monkeypatch).specific_technology == "Go"
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the privacy filter patterns
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.app.services.privacy_filter import PrivacyFilter, _filter_string_cached
+
+
+def test_filter_string_removes_personal_data():
+    """Emails, phones and CPF are replaced in a single pass"""
+    text = "Contato: joao.silva@usp.br, (11) 98765-4321, CPF 123.456.789-01."
+    filtered = PrivacyFilter.filter_string(text)
+    
+    assert "[EMAIL_REMOVED]" in filtered
+    assert "[PHONE_REMOVED]" in filtered
+    assert "[CPF_REMOVED]" in filtered
+    assert "joao.silva" not in filtered
+    assert filtered.endswith(".")
+
+
+def test_phone_without_area_code():
+    """Phone numbers without area code are still detected"""
+    assert PrivacyFilter.filter_string("ligue 98765-4321") == "ligue [PHONE_REMOVED]"
+
+
+def test_filter_string_is_memoized():
+    """Repeated sections are served from the cache"""
+    text = "Responsável: maria@empresa.com.br"
+    first = PrivacyFilter.filter_string(text)
+    hits = _filter_string_cached.cache_info().hits
+    
+    assert PrivacyFilter.filter_string(text) == first == "Responsável: [EMAIL_REMOVED]"
+    assert _filter_string_cached.cache_info().hits == hits + 1
+
+
+def test_filter_dict_without_personal_data_is_not_copied():
+    """Clean structures are returned as-is; only changed branches are rebuilt"""
+    clean = {"sobre_empresa": "Banco", "atividades_realizadas": [{"descricao": "APIs"}]}
+    assert PrivacyFilter.filter_dict(clean) is clean
+    
+    data = {
+        "sobre_empresa": "Banco",
+        "estagiario": {"nome_completo": "Fulano", "curso": "Computação"},
+        "atividades_realizadas": [{"descricao": "APIs"}, "fale com a@b.com"],
+    }
+    filtered = PrivacyFilter.filter_dict(data)
+    
+    assert filtered == {
+        "sobre_empresa": "Banco",
+        "estagiario": {"curso": "Computação"},
+        "atividades_realizadas": [{"descricao": "APIs"}, "fale com [EMAIL_REMOVED]"],
+    }
+    assert filtered["atividades_realizadas"][0] is data["atividades_realizadas"][0]
+    assert data["estagiario"]["nome_completo"] == "Fulano"
+
+
+def test_deeply_nested_structure():
+    """Nesting deeper than the recursion limit is filtered without errors"""
+    data = {"email": "x"}
+    for _ in range(sys.getrecursionlimit() * 2):
+        data = {"nested": [data]}
+    
+    filtered = PrivacyFilter.filter_dict(data)
+    for _ in range(sys.getrecursionlimit() * 2):
+        filtered = filtered["nested"][0]
+    assert filtered == {}
+
+
+def test_pathological_input_is_fast():
+    """Adversarial strings must not trigger catastrophic backtracking"""
+    pathological = [
+        "a" * 100000 + "@",
+        "a@" + "b-" * 50000,
+        "a." * 50000,
+        "a@" + "b." * 50000 + "1",
+        "1" * 100000,
+    ]
+    for text in pathological:
+        start = time.perf_counter()
+        PrivacyFilter.filter_string(text)
+        PrivacyFilter.validate_safe_response(text)
+        assert time.perf_counter() - start < 1.0
+
+
+if __name__ == "__main__":
+    test_filter_string_removes_personal_data()
+    test_phone_without_area_code()
+    test_filter_string_is_memoized()
+    test_filter_dict_without_personal_data_is_not_copied()
+    test_deeply_nested_structure()
+    test_pathological_input_is_fast()
+    print("✅ All privacy filter tests passed!")